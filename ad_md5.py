@@ -6,27 +6,7 @@ from sys import argv
 
 import macresources  # type: ignore
 
-
-def escape_string(input_string: str) -> str:
-    escaped_name = ""
-    for character in input_string:
-        if character == "\x81":
-            escaped_name += "\x81\x79"
-        elif character in '/":*|\\?%<>' or ord(character) < 0x20:
-            escaped_name += "\x81" + chr(0x80 + ord(character))
-        else:
-            escaped_name += character
-    return escaped_name
-
-
-def needs_punyencoding(original_string: str) -> bool:
-    if not original_string.isascii():
-        return True
-    if original_string != escape_string(original_string):
-        return True
-    if original_string[-1] in " .":
-        return True
-    return False
+from puny import punyencode
 
 
 def __main__():
@@ -75,9 +55,7 @@ def __main__():
         file_handle.read(file_size if file_size < 5000 else 5000)
     ).hexdigest()
 
-    file_name = path.split(argv[1])[-1]
-    if needs_punyencoding(file_name):
-        file_name = "xn--" + escape_string(file_name).encode("punycode").decode("ascii")
+    file_name = punyencode(path.split(argv[1])[-1])
 
     # if type(proj_version) is int:
     #     proj_version = pjvers[proj_version]
@@ -0,0 +1,84 @@
+"""
+Apple Data Compression (ADC) decoder, as used by Disk Copy 6 / NDIF images.
+
+Tokens are parsed straight from a memoryview and decoded into one flat
+bytearray, so LZ matches are plain slice copies instead of trips through a
+ring buffer. Overlapping matches (distance < length) are expanded by
+repeating the pattern.
+"""
+
+WINDOW_SIZE = 65536
+FLUSH_SIZE = 16 * 1024 * 1024
+
+
+class DecompressionError(Exception):
+    pass
+
+
+def decompress(src, out_f=None, flush_size=FLUSH_SIZE, out=None):
+    """
+    Decompress the ADC stream in src (any bytes-like object).
+
+    Without out_f, returns the decompressed data as a bytearray (appended
+    to out if given). With out_f, output is written in flush_size pieces,
+    keeping only the 64 KiB match window in memory, and the number of
+    bytes written is returned.
+    """
+    view = memoryview(src).cast("B")
+    end = len(view)
+    if out is None:
+        out = bytearray()
+    base = len(out)
+    written = 0
+    limit = flush_size + WINDOW_SIZE
+    pos = 0
+
+    while pos < end:
+        code = view[pos]
+        pos += 1
+
+        if code & 0x80:
+            # Literal
+            size = (code & 0x7F) + 1
+            if pos + size > end:
+                raise DecompressionError("literal runs past end of input")
+            out += view[pos : pos + size]
+            pos += size
+        else:
+            if code & 0x40:
+                # Large offset
+                if pos + 2 > end:
+                    raise DecompressionError("truncated match")
+                size = (code & 0x3F) + 4
+                distance = ((view[pos] << 8) | view[pos + 1]) + 1
+                pos += 2
+            else:
+                # Small offset
+                if pos >= end:
+                    raise DecompressionError("truncated match")
+                size = ((code & 0x3C) >> 2) + 3
+                distance = (((code & 0x03) << 8) | view[pos]) + 1
+                pos += 1
+
+            start = len(out) - distance
+            if start < base:
+                # Reaches back before the first byte: the window starts zeroed.
+                for _ in range(size):
+                    index = len(out) - distance
+                    out.append(out[index] if index >= base else 0)
+            elif distance >= size:
+                out += out[start : start + size]
+            else:
+                pattern = out[start:]
+                out += (pattern * (size // distance + 1))[:size]
+
+        if out_f is not None and len(out) >= limit:
+            keep = len(out) - WINDOW_SIZE
+            out_f.write(out[base:keep])
+            written += keep - base
+            del out[base:keep]
+
+    if out_f is None:
+        return out
+    out_f.write(out[base:])
+    return written + len(out) - base
@@ -0,0 +1,250 @@
+"""
+Declarative table-of-contents parsing for the extract_* scripts.
+
+An ArchiveSpec describes a format's TOC: the header struct, the struct
+of one entry, which entry values hold the name, offset and size, how
+names are stored and encoded, and how to tell compressed members. Most
+formats only need struct formats and field names:
+
+    FPK = ArchiveSpec(
+        header="<4sI", header_fields=("magic", "count"), magic=b"KAPF",
+        entry="<16sII", fields=("name", "offset", "size"),
+    )
+    with map_archive(path) as data:
+        header, members = parse_toc(FPK, data)
+
+Fixed-size entries are decoded in one struct.iter_unpack pass over a
+memoryview of the table, so nothing is copied out of an mmap; when the
+name, offset and size are plain entry fields, the members are built from
+those rows in a single comprehension. Entries followed
+by a variable-length name (NUL-terminated, or with a length in the
+entry) are walked with unpack_from and find() over the same buffer,
+never a byte at a time.
+
+With size=None, a member runs up to the next member's offset (in offset
+order, so unsorted tables work) and the last one to the end of the file.
+"""
+import itertools
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Callable, Iterator, NamedTuple
+
+
+class ArchiveSpec(NamedTuple):
+    entry: str
+    fields: tuple[str, ...]
+    header: str = ""
+    header_fields: tuple[str, ...] = ()
+    # Compared with the header's "magic" field
+    magic: bytes | None = None
+    # Negative values count from the end of the file
+    header_offset: int = 0
+    # Header field, callable(header), or None for entries up to end of file
+    count: str | Callable[[dict], int] | None = "count"
+    # Default: right after the header. Callable(header, file size)
+    toc_offset: int | Callable[[dict, int], int] | None = None
+    # Entry field holding a fixed-size name, or None for unnamed members
+    name: str | None = "name"
+    # Name follows each entry: NUL-terminated, or callable(entry) -> length
+    name_follows: bool = False
+    name_length: Callable[[dict], int] | None = None
+    encoding: str = "ascii"
+    # Entry field, or callable(entry) for values split over several fields
+    offset: str | Callable[[dict], int] = "offset"
+    # Entry field, callable(entry), or None to run to the next member
+    size: str | Callable[[dict], int] | None = "size"
+    compressed: Callable[[dict], bool] | None = None
+    # Entry fields appended to each member, after compressed
+    extra: tuple[str, ...] = ()
+
+
+class ArchiveError(Exception):
+    pass
+
+
+@contextmanager
+def map_archive(path) -> Iterator[mmap.mmap | bytes]:
+    """
+    Maps an archive read-only for a with block (empty files give b"").
+
+    parse_toc() copies everything it returns out of the mapping, so the
+    members can be used after the block has unmapped it.
+    """
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b""
+            return
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        yield data
+
+
+def decode_name(raw: bytes, encoding: str) -> str:
+    return raw.split(b"\0", 1)[0].decode(encoding)
+
+
+def column(spec_value, fields: tuple[str, ...], rows: list[tuple]) -> list:
+    """One entry value for every row: a field's column, or a callable's results."""
+    if callable(spec_value):
+        return [spec_value(dict(zip(fields, row))) for row in rows]
+    return list(map(itemgetter(fields.index(spec_value)), rows))
+
+
+def name_column(spec: ArchiveSpec, rows: list[tuple]) -> list[str]:
+    index = spec.fields.index(spec.name)
+    encoding = spec.encoding
+    return [row[index].split(b"\0", 1)[0].decode(encoding) for row in rows]
+
+
+def simple(spec: ArchiveSpec) -> bool:
+    """
+    True if offset and size are plain entry fields, nothing is compressed
+    and no extra fields are wanted.
+    """
+    return (
+        isinstance(spec.offset, str)
+        and isinstance(spec.size, str)
+        and spec.compressed is None
+        and not spec.extra
+    )
+
+
+def read_header(spec: ArchiveSpec, data) -> tuple[dict, int]:
+    """Returns (header fields, offset just past the header)."""
+    start = spec.header_offset
+    if start < 0:
+        start += len(data)
+    header_size = struct.calcsize(spec.header) if spec.header else 0
+    try:
+        values = struct.unpack_from(spec.header, data, start) if spec.header else ()
+    except struct.error as e:
+        raise ArchiveError(f"header: {e}") from None
+    header = dict(zip(spec.header_fields, values))
+    if spec.magic is not None and header.get("magic") != spec.magic:
+        raise ArchiveError(f"bad magic {header.get('magic')!r}, not {spec.magic!r}")
+    return header, start + header_size
+
+
+def read_entries(spec: ArchiveSpec, data, start: int, count: int | None):
+    """
+    Returns (rows, names): the raw entry tuples and, if names follow the
+    entries, their names.
+    """
+    entry = struct.Struct(spec.entry)
+    if not spec.name_follows and not spec.name_length:
+        if count is None:
+            count = (len(data) - start) // entry.size
+        end = start + count * entry.size
+        if end > len(data):
+            raise ArchiveError(f"table of {count} entries runs past end of file")
+        # A view, not a slice: the table isn't copied out of an mmap.
+        with memoryview(data)[start:end] as table:
+            return list(entry.iter_unpack(table)), None
+
+    unpack_from = entry.unpack_from
+    name_length = spec.name_length
+    encoding = spec.encoding
+    limit = len(data) - entry.size
+    rows = []
+    names = []
+    pos = start
+    for index in range(count) if count is not None else itertools.count():
+        if pos > limit:
+            if count is None:
+                break
+            raise ArchiveError(f"entry {index} runs past end of file")
+        row = unpack_from(data, pos)
+        pos += entry.size
+        if name_length:
+            length = name_length(dict(zip(spec.fields, row)))
+            end = pos + length
+            if length < 0 or end > len(data):
+                raise ArchiveError(f"entry {index}: bad name length {length}")
+            names.append(decode_name(data[pos:end], encoding))
+            pos = end
+        else:
+            end = data.find(b"\0", pos)
+            if end < 0:
+                raise ArchiveError(f"entry {index}: unterminated name")
+            names.append(data[pos:end].decode(encoding))
+            pos = end + 1
+        rows.append(row)
+    return rows, names
+
+
+def parse_toc(spec: ArchiveSpec, data) -> tuple[dict, list[tuple]]:
+    """
+    Parses the table of contents of the archive in data (bytes or mmap).
+
+    Returns (header fields, members in table order), each member being a
+    (name, offset, size, compressed) tuple followed by the spec's extra
+    entry fields, if any.
+    """
+    header, start = read_header(spec, data)
+    if spec.count is None:
+        count = None
+    elif callable(spec.count):
+        count = spec.count(header)
+    else:
+        count = header[spec.count]
+    if callable(spec.toc_offset):
+        start = spec.toc_offset(header, len(data))
+    elif spec.toc_offset is not None:
+        start = spec.toc_offset
+
+    rows, names = read_entries(spec, data, start, count)
+    fields = spec.fields
+    if names is None and isinstance(spec.name, str) and simple(spec):
+        # Every value is a plain field: build the members in one pass.
+        name, offset, size = map(fields.index, (spec.name, spec.offset, spec.size))
+        encoding = spec.encoding
+        return header, [
+            (
+                row[name].split(b"\0", 1)[0].decode(encoding),
+                row[offset],
+                row[size],
+                False,
+            )
+            for row in rows
+        ]
+
+    if names is None:
+        names = name_column(spec, rows) if spec.name else [""] * len(rows)
+    offsets = column(spec.offset, fields, rows)
+
+    if spec.size is None:
+        sizes = [0] * len(rows)
+        order = sorted(range(len(rows)), key=offsets.__getitem__)
+        ends = [offsets[i] for i in order[1:]] + [len(data)]
+        for i, end in zip(order, ends):
+            sizes[i] = end - offsets[i]
+    else:
+        sizes = column(spec.size, fields, rows)
+
+    if spec.compressed:
+        compressed = column(spec.compressed, fields, rows)
+    else:
+        compressed = [False] * len(rows)
+    extras = [column(field, fields, rows) for field in spec.extra]
+    return header, list(zip(names, offsets, sizes, compressed, *extras))
+
+
+# Member magics for detect_extension(), tried in order after WAVE and XMIDI
+MAGICS = ((b"UN05", ".uni"), (b"Creative Voice File", ".voc"))
+# Enough of a member for every magic detect_extension() knows
+MAGIC_SIZE = 32
+
+
+def detect_extension(data: bytes, magics=MAGICS) -> str:
+    """Detect a member's file extension from its first MAGIC_SIZE bytes."""
+    if data.startswith(b"RIFF") and len(data) >= 12 and data[8:12] == b"WAVE":
+        return ".wav"
+    if data.startswith(b"FORM") and len(data) >= 12 and data[8:12] == b"XDIR":
+        return ".xmi"
+    for magic, extension in magics:
+        if data.startswith(magic):
+            return extension
+    return ".bin"
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Throughput of adc.decompress against the old ring-buffer decoder that
+decompress-diskcopy-image.py used, on a synthetic ADC stream.
+
+Usage: bench_adc.py [output size in MB, default 16]
+"""
+import io
+import random
+import sys
+import time
+
+import adc
+
+WINDOW_SIZE = 65536
+
+
+def legacy_decompress(in_f, out_f, compressed_data_size):
+    """The previous decoder: byte-wise reads through a 64 KiB ring buffer."""
+
+    def block_copy(dest, dest_offset, src, src_offset, size):
+        if size:
+            dest[dest_offset : dest_offset + size] = src[src_offset : src_offset + size]
+
+    def insert_sl(sl, sl_pos, data, offset, size):
+        available = WINDOW_SIZE - sl_pos
+        if available < size:
+            block_copy(sl, sl_pos, data, offset, available)
+            return insert_sl(sl, 0, data, offset + available, size - available)
+        block_copy(sl, sl_pos, data, offset, size)
+        return sl_pos + size
+
+    def read_sl(sl, sl_pos, out_buf, out_buf_pos, size):
+        available = WINDOW_SIZE - sl_pos
+        if available < size:
+            block_copy(out_buf, out_buf_pos, sl, sl_pos, available)
+            read_sl(sl, 0, out_buf, out_buf_pos + available, size - available)
+        else:
+            block_copy(out_buf, out_buf_pos, sl, sl_pos, size)
+
+    def read_lz(sl, sl_pos, out_buf, coded_offset, length):
+        actual_offset = coded_offset + 1
+        read_pos = (sl_pos + WINDOW_SIZE - actual_offset) % WINDOW_SIZE
+        out_buf_pos = 0
+        while actual_offset < length:
+            read_sl(sl, read_pos, out_buf, out_buf_pos, actual_offset)
+            out_buf_pos += actual_offset
+            length -= actual_offset
+        read_sl(sl, read_pos, out_buf, out_buf_pos, length)
+
+    sl = bytearray(WINDOW_SIZE)
+    lz_bytes = bytearray(128)
+    sl_pos = 0
+    while compressed_data_size > 0:
+        code = in_f.read(1)[0]
+        compressed_data_size -= 1
+        if code & 0x80:
+            size = (code & 0x7F) + 1
+            output_data = in_f.read(size)
+            compressed_data_size -= size
+        elif code & 0x40:
+            extra = in_f.read(2)
+            compressed_data_size -= 2
+            size = (code & 0x3F) + 4
+            read_lz(sl, sl_pos, lz_bytes, (extra[0] << 8) + extra[1], size)
+            output_data = lz_bytes
+        else:
+            extra = in_f.read(1)[0]
+            compressed_data_size -= 1
+            size = ((code & 0x3C) >> 2) + 3
+            read_lz(sl, sl_pos, lz_bytes, ((code & 0x3) << 8) + extra, size)
+            output_data = lz_bytes
+        out_f.write(output_data[0:size])
+        out_f.tell()
+        sl_pos = insert_sl(sl, sl_pos, output_data, 0, size)
+
+
+def make_stream(target_size, seed=0):
+    """Random but valid ADC tokens: literals, short/long and overlapping matches."""
+    rng = random.Random(seed)
+    stream = bytearray()
+    produced = 0
+    while produced < target_size:
+        kind = rng.random()
+        if kind < 0.3 or produced < 1024:
+            size = rng.randint(1, 128)
+            stream.append(0x80 | (size - 1))
+            stream += rng.randbytes(size)
+        elif kind < 0.7:
+            size = rng.randint(3, 18)
+            distance = rng.randint(1, min(produced, 1024))
+            stream.append(((size - 3) << 2) | ((distance - 1) >> 8))
+            stream.append((distance - 1) & 0xFF)
+        else:
+            size = rng.randint(4, 67)
+            distance = rng.randint(1, min(produced, WINDOW_SIZE))
+            stream.append(0x40 | (size - 4))
+            stream += (distance - 1).to_bytes(2, "big")
+        produced += size
+    return bytes(stream)
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    stream = make_stream(megabytes * 1024 * 1024)
+
+    start = time.perf_counter()
+    legacy_out = io.BytesIO()
+    legacy_decompress(io.BytesIO(stream), legacy_out, len(stream))
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_out = io.BytesIO()
+    adc.decompress(stream, new_out)
+    new_time = time.perf_counter() - start
+
+    size = len(new_out.getbuffer()) / (1024 * 1024)
+    assert legacy_out.getvalue() == new_out.getvalue(), "outputs differ"
+    print(f"legacy: {legacy_time:.2f}s ({size / legacy_time:.1f} MB/s)")
+    print(f"adc:    {new_time:.2f}s ({size / new_time:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
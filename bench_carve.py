@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Scanning throughput of carve.find_hits from 1 to N processes, on a
+synthetic image with media files scattered through random data.
+
+Every run's hits are checked against a single-range scan, using small
+ranges so plenty of signatures straddle range boundaries.
+
+Usage: bench_carve.py [image size in MB, default 256] [max jobs, default CPUs]
+"""
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+import carve
+
+
+def make_image(path: str, size: int, seed: int = 0) -> None:
+    """Random data with a small WAV, MIDI or VOC file every 64 KiB or so."""
+    rng = random.Random(seed)
+    samples = [
+        b"RIFF" + struct.pack("<I", 1004) + b"WAVEfmt " + bytes(996),
+        b"MThd" + struct.pack(">IHHH", 6, 0, 1, 96)
+        + b"MTrk" + struct.pack(">I", 4) + b"\x00\xff\x2f\x00",
+        b"Creative Voice File\x1a" + struct.pack("<HHH", 0x1A, 0x10A, 0x1129)
+        + b"\x01" + (102).to_bytes(3, "little") + bytes(102) + b"\x00",
+    ]
+    with open(path, "wb") as f:
+        while f.tell() < size:
+            f.write(rng.randbytes(rng.randint(1, 128 * 1024)))
+            f.write(rng.choice(samples))
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    kinds = tuple(carve.SIGNATURES)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "image.bin")
+        make_image(path, megabytes * 1024 * 1024)
+        image_size = os.path.getsize(path)
+        size = image_size / (1024 * 1024)
+
+        expected = carve.find_hits(path, kinds, 1, chunk_size=1 << 62)
+        assert expected == carve.find_hits(path, kinds, 1, chunk_size=4099)
+        print(f"{size:.0f} MB, {len(expected)} hits")
+
+        jobs = 1
+        while True:
+            # Four ranges per process, so the pool has work to balance
+            chunk_size = max(image_size // (4 * jobs), 1)
+            start = time.perf_counter()
+            hits = carve.find_hits(path, kinds, jobs, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            assert hits == expected, f"hits differ with {jobs} jobs"
+            print(f"{jobs:3} jobs: {elapsed:.2f}s ({size / elapsed:.0f} MB/s)")
+            if jobs >= max_jobs:
+                break
+            jobs = min(jobs * 2, max_jobs)
+
+
+if __name__ == "__main__":
+    main()
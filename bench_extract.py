@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Throughput of archive member extraction: the old seek/read/write loop
+against fastcopy.extract_members with each copy method forced.
+
+A synthetic archive with thousands of members is written to a temp dir
+and every method's output is checked against the old loop's.
+
+Usage: bench_extract.py [members, default 5000] [max member KB, default 256]
+"""
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fastcopy
+
+
+def make_archive(path: str, count: int, max_size: int, seed: int = 0):
+    """Writes back-to-back members of random size; returns their (offset, size)."""
+    rng = random.Random(seed)
+    members = []
+    with open(path, "wb") as f:
+        for _ in range(count):
+            size = rng.randint(0, max_size)
+            members.append((f.tell(), size))
+            f.write(rng.randbytes(size))
+    return members
+
+
+def read_write(f, members) -> int:
+    """The loop the extract_* scripts used to run."""
+    total = 0
+    for path, offset, size in members:
+        f.seek(offset)
+        with open(path, "wb") as of:
+            total += of.write(f.read(size))
+    return total
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_size = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "archive.dat")
+        layout = make_archive(archive, count, max_size)
+        names = [f"{i:05}.bin" for i in range(count)]
+
+        with open(archive, "rb") as f:
+            for method in ("read/write", "copy_file_range", "sendfile", "buffered"):
+                out_dir = os.path.join(tmp, method.replace("/", "_"))
+                os.mkdir(out_dir)
+                members = [
+                    (os.path.join(out_dir, name), offset, size)
+                    for name, (offset, size) in zip(names, layout)
+                ]
+                start = time.perf_counter()
+                try:
+                    if method == "read/write":
+                        total = read_write(f, members)
+                    else:
+                        total = fastcopy.extract_members(f.fileno(), members, method)
+                except OSError as e:
+                    print(f"{method:16} unsupported here: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+
+                if method != "read/write":
+                    reference = os.path.join(tmp, "read_write")
+                    _, mismatch, errors = filecmp.cmpfiles(
+                        reference, out_dir, names, shallow=False
+                    )
+                    assert not mismatch and not errors, f"{method} output differs"
+                megabytes = total / (1024 * 1024)
+                print(
+                    f"{method:16} {count} members, {megabytes:.0f} MB: "
+                    f"{elapsed:.2f}s ({megabytes / elapsed:.0f} MB/s)"
+                )
+
+
+if __name__ == "__main__":
+    main()
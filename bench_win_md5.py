@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Compare peak RSS and wall time of win_md5.extract_version against the
+old read-everything-after-RIFX approach.
+
+Each run happens in a fresh interpreter so peak RSS isn't shared.
+Without arguments a synthetic 600 MB projector is generated in a temp dir.
+"""
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import resource, struct, sys, time
+import win_md5
+
+def extract_version_full_read(f):
+    f.seek(-4, 2)
+    projoff = struct.unpack("<I", f.read(4))[0]
+    f.seek(projoff + 4)
+    rifxoff = struct.unpack("<I", f.read(4))[0]
+    f.seek(rifxoff)
+    data = f.read()
+    for marker in (b"LPPApami", b"APPLimap"):
+        off = data.find(marker)
+        if off > 0:
+            f.seek(rifxoff + off + 0x14)
+            pjver = struct.unpack("<I", f.read(4))[0]
+            if pjver:
+                return pjver
+            break
+    return 0x404
+
+method = sys.argv[2]
+start = time.perf_counter()
+with open(sys.argv[1], "rb") as f:
+    if method == "full":
+        ver = extract_version_full_read(f)
+    else:
+        ver = win_md5.extract_version(f)
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(f"{method:8} version:0x{ver:x} time:{elapsed:.3f}s peak_rss:{rss // 1024}MB")
+"""
+
+
+def make_projector(path: str, size: int) -> None:
+    """An EXE stub, a RIFX header with imap near the start, then padding."""
+    rifxoff = 0x1000
+    with open(path, "wb") as f:
+        f.write(b"MZ" + bytes(rifxoff - 2))
+        f.write(b"XFIR" + bytes(8) + b"APPLimap" + bytes(0xC) + struct.pack("<I", 0x782))
+        f.truncate(size - 8)
+        f.seek(0, 2)
+        projoff = f.tell()
+        f.write(b"PJ95" + struct.pack("<I", rifxoff))
+        f.write(struct.pack("<I", projoff))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = os.path.join(tmp, "projector.exe")
+            make_projector(path, 600 * 1024 * 1024)
+        for method in ("full", "bounded"):
+            subprocess.run(
+                [sys.executable, "-c", CHILD, path, method],
+                check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+
+
+if __name__ == "__main__":
+    main()
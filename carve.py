@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Carve embedded media files out of disc images and other containers
+
+All registered signatures are found in a single regex pass over an mmap
+of the input, so memory use is constant and time linear in input size.
+Every hit is checked against its format's length fields before being
+written, and hits that run past the end of the input are skipped. MIDI
+and XMI hits must have a complete chunk tree (see midichunks.py).
+
+Large inputs are scanned in CHUNK_SIZE ranges across a process pool;
+each range's search runs a signature length into the next, so nothing
+straddling a boundary is missed.
+
+Usage: carve.py [-j JOBS] [-t wav,hmp,...] FILE...
+
+Output goes next to the input as FILE-001.wav, FILE-002.wav, ..., numbered
+per format. rip_wav.py, rip_hmp.py, rip_xmi.py and rip_mid.py are this
+restricted to one format.
+"""
+import argparse
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from struct import error as struct_error
+from struct import unpack_from
+from typing import Callable, NamedTuple
+
+from fastcopy import copy_range
+from midichunks import smf_extent, xmi_extent
+
+
+class Signature(NamedTuple):
+    ext: str
+    magic: bytes
+    # (data, offset) -> total size of the file starting at offset, or None
+    size: Callable[[mmap.mmap, int], int | None]
+    # (data, offset, size) -> extra text for the hit's log line, if any
+    label: Callable[[mmap.mmap, int, int], str | None] | None = None
+
+
+def wav_size(data, offset: int) -> int | None:
+    if data[offset + 8 : offset + 12] != b"WAVE":
+        return None
+    return unpack_from("<I", data, offset + 4)[0] + 8
+
+
+def hmp_size(data, offset: int) -> int | None:
+    size = unpack_from("<I", data, offset + 0x20)[0]
+    return size if size >= 0x24 else None
+
+
+def mid_label(data, offset: int, size: int) -> str | None:
+    """The text of the first track's first marker meta event, often a file name."""
+    track = offset + 8 + unpack_from(">I", data, offset + 4)[0]
+    track_end = track + 8 + unpack_from(">I", data, track + 4)[0]
+    pos = data.find(b"\xff\x06", track + 8, track_end)
+    if pos < 0 or not data[pos + 2]:
+        return None
+    name = data[pos + 3 : pos + 3 + data[pos + 2]]
+    try:
+        return f"marker {name.decode('utf-8')}"
+    except UnicodeDecodeError:
+        return f"marker {name}"
+
+
+def voc_size(data, offset: int) -> int | None:
+    """Walks the blocks after the header up to the terminator block."""
+    pos = offset + unpack_from("<H", data, offset + 0x14)[0]
+    end = len(data)
+    while pos < end:
+        if data[pos] == 0:
+            return pos + 1 - offset
+        pos += 4 + int.from_bytes(data[pos + 1 : pos + 4], "little")
+    return None
+
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+SIGNATURES = {
+    "wav": Signature("wav", b"RIFF", wav_size),
+    "hmp": Signature("hmp", b"HMIMIDIP013195" + b"\x00" * 18, hmp_size),
+    "xmi": Signature("xmi", b"FORM\x00\x00\x00\x0eXDIR", xmi_extent),
+    "mid": Signature("mid", b"MThd", smf_extent, mid_label),
+    "voc": Signature("voc", b"Creative Voice File\x1a", voc_size),
+}
+
+
+def compile_signatures(kinds) -> tuple[re.Pattern, dict[bytes, Signature]]:
+    signatures = [SIGNATURES[kind] for kind in kinds]
+    pattern = re.compile(b"|".join(re.escape(sig.magic) for sig in signatures))
+    return pattern, {sig.magic: sig for sig in signatures}
+
+
+def scan(data, kinds, start: int = 0, end: int | None = None):
+    """
+    Yields (offset, ext, size) for every valid hit starting in [start, end).
+
+    Matches are reported by offset in the input, so hits nested inside an
+    earlier hit are found too. The search runs a signature length past end,
+    so a signature straddling end is found by this range and not the next.
+    """
+    pattern, by_magic = compile_signatures(kinds)
+    if end is None:
+        end = len(data)
+    overlap = max(len(magic) for magic in by_magic) - 1
+    for match in pattern.finditer(data, start, min(end + overlap, len(data))):
+        offset = match.start()
+        if offset >= end:
+            break
+        sig = by_magic[match.group()]
+        try:
+            size = sig.size(data, offset)
+        except (struct_error, IndexError):
+            continue
+        if size is None or size < len(sig.magic) or offset + size > len(data):
+            continue
+        yield offset, sig.ext, size
+
+
+def describe(data, offset: int, ext: str, size: int) -> str:
+    line = f"{offset:#x}: {ext}, {size} bytes"
+    label = SIGNATURES[ext].label
+    if label:
+        try:
+            text = label(data, offset, size)
+        except (struct_error, IndexError):
+            text = None
+        if text:
+            line += f", {text}"
+    return line
+
+
+def write_hits(input_file_path: str, data, hits) -> int:
+    """Copies every hit to its own numbered file; returns the count."""
+    numbers = {}
+    with open(input_file_path, "rb") as f:
+        for offset, ext, size in hits:
+            num = numbers[ext] = numbers.get(ext, 0) + 1
+            print(describe(data, offset, ext, size))
+            with open(f"{input_file_path}-{num:03}.{ext}", "wb", buffering=0) as of:
+                copy_range(f.fileno(), of.fileno(), offset, size)
+    return sum(numbers.values())
+
+
+def map_file(input_file_path: str) -> mmap.mmap | None:
+    """Maps a file read-only, or returns None for empty files."""
+    with open(input_file_path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def scan_range(job) -> list[tuple[int, str, int]]:
+    """Worker: maps the input and scans one range of it."""
+    input_file_path, kinds, start, end = job
+    data = map_file(input_file_path)
+    try:
+        return list(scan(data, kinds, start, end))
+    finally:
+        data.close()
+
+
+def find_hits(
+    input_file_path: str, kinds, jobs: int = 1, chunk_size: int = CHUNK_SIZE
+) -> list[tuple[int, str, int]]:
+    """
+    Scans the whole input, split into chunk_size ranges across jobs processes.
+
+    Hits come back merged in offset order with duplicates removed.
+    """
+    size = os.path.getsize(input_file_path)
+    ranges = [
+        (input_file_path, kinds, start, min(start + chunk_size, size))
+        for start in range(0, size, chunk_size)
+    ]
+    if jobs > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = list(executor.map(scan_range, ranges))
+    else:
+        results = [scan_range(job) for job in ranges]
+    return sorted({hit for hits in results for hit in hits})
+
+
+def carve_file(input_file_path: str, kinds=tuple(SIGNATURES), jobs: int = 0) -> int:
+    """Carves every hit of kinds out of the input; jobs 0 uses one per CPU."""
+    data = map_file(input_file_path)
+    if not data:
+        return 0
+    try:
+        hits = find_hits(input_file_path, kinds, jobs or os.cpu_count() or 1)
+        return write_hits(input_file_path, data, hits)
+    finally:
+        data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carve media files out of images")
+    parser.add_argument("inputs", nargs="+", help="Files to scan")
+    parser.add_argument(
+        "-t",
+        "--types",
+        default=",".join(SIGNATURES),
+        help=f"Comma-separated formats to carve (default: {','.join(SIGNATURES)})",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of processes scanning in parallel (0 = one per CPU)",
+    )
+    args = parser.parse_args()
+    kinds = args.types.split(",")
+    for kind in kinds:
+        if kind not in SIGNATURES:
+            parser.error(f"unknown format {kind}")
+
+    for input_file_path in args.inputs:
+        count = carve_file(input_file_path, kinds, args.jobs)
+        print(f"{input_file_path}: {count} files")
+
+
+if __name__ == "__main__":
+    main()
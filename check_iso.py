@@ -6,19 +6,25 @@ from typing import Union
 
 from _io import BufferedReader
 
+from ndif import DiskImage, NDIFError
+
 APPLE_PARTITION_SIGNATURE = b"PM\x00\x00"
 SECTOR_SIZE = 512
 
 detected_formats = []
 
-file_obj: Union[BytesIO, BufferedReader]
+file_obj: Union[BytesIO, BufferedReader, DiskImage]
 if argv[1].startswith("http"):
     import requests
 
     response = requests.get(argv[1], headers={"Range": f"bytes=0-32774"})  # 0x8006
     file_obj = BytesIO(response.content)
 else:
-    file_obj = open(argv[1], "rb")
+    try:
+        # Compressed Disk Copy image: probe the decoded disk in place
+        file_obj = DiskImage(argv[1])
+    except (NDIFError, OSError):
+        file_obj = open(argv[1], "rb")
 
 # ISO Primary Volume Descriptor
 file_obj.seek(64 * SECTOR_SIZE)
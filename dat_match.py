@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Match files against No-Intro / Redump / ClrMamePro DAT files.
+
+Every file is hashed once (through hash.py's streaming engine and the shared
+hash cache) and looked up by sha1, md5 and crc32+size. Each file is reported
+as have (digest and name match), mislabelled (digest matches under another
+name) or unknown, followed by every DAT entry that was never seen (miss).
+
+DATs are parsed incrementally in a background thread while files are being
+hashed, so a large DAT does not hold up the start of the scan.
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from hash import ALGORITHMS, hash_file, iter_files
+from hashcache import HashCache, file_key
+from nes_hash import rom_digests
+
+CMP_TOKEN = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+
+
+def iter_logiqx(dat_path):
+    """Yield (game, name, size, crc, md5, sha1) from a Logiqx XML DAT."""
+    game = ""
+    for event, elem in ET.iterparse(dat_path, events=("start", "end")):
+        if event == "start":
+            if elem.tag in ("game", "machine"):
+                game = elem.get("name", "")
+            continue
+        if elem.tag == "rom":
+            yield (
+                game,
+                elem.get("name", ""),
+                int(elem.get("size") or -1),
+                (elem.get("crc") or "").lower(),
+                (elem.get("md5") or "").lower(),
+                (elem.get("sha1") or "").lower(),
+            )
+        elif elem.tag in ("game", "machine"):
+            # Drop finished games so memory stays flat for huge DATs.
+            elem.clear()
+
+
+def iter_clrmamepro(dat_path):
+    """Yield (game, name, size, crc, md5, sha1) from a ClrMamePro text DAT."""
+    game = ""
+    stack = []
+    fields = {}
+    key = None
+    with open(dat_path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            for quoted, paren, word in CMP_TOKEN.findall(line):
+                if paren == "(":
+                    stack.append(key)
+                    if key == "rom":
+                        fields = {}
+                    key = None
+                elif paren == ")":
+                    block = stack.pop() if stack else None
+                    if block == "rom":
+                        yield (
+                            game,
+                            fields.get("name", ""),
+                            int(fields.get("size") or -1),
+                            fields.get("crc", "").lower(),
+                            fields.get("md5", "").lower(),
+                            fields.get("sha1", "").lower(),
+                        )
+                    key = None
+                elif key is None:
+                    key = word
+                else:
+                    value = quoted if quoted or not word else word
+                    if stack and stack[-1] == "rom":
+                        fields[key] = value
+                    elif key == "name" and len(stack) == 1 and stack[0] in (
+                        "game",
+                        "machine",
+                        "resource",
+                    ):
+                        game = value
+                    key = None
+
+
+def iter_dat(dat_path):
+    with open(dat_path, "rb") as f:
+        is_xml = f.read(64).lstrip().startswith(b"<")
+    return iter_logiqx(dat_path) if is_xml else iter_clrmamepro(dat_path)
+
+
+class DatIndex:
+    """
+    Hash-indexed view of one or more DATs.
+
+    Entries are appended as they are parsed; load() runs in a thread and
+    lookups wait on `loaded` so they always see the complete index.
+    """
+
+    def __init__(self, dat_paths):
+        self.dat_paths = dat_paths
+        self.roms = []
+        self.by_sha1 = {}
+        self.by_md5 = {}
+        self.by_crc = {}
+        self.loaded = threading.Event()
+        self.error = None
+
+    def add(self, rom) -> None:
+        rom_id = len(self.roms)
+        self.roms.append(rom)
+        _, _, size, crc, md5, sha1 = rom
+        if sha1:
+            self.by_sha1.setdefault(sha1, []).append(rom_id)
+        if md5:
+            self.by_md5.setdefault(md5, []).append(rom_id)
+        if crc:
+            self.by_crc.setdefault((crc, size), []).append(rom_id)
+
+    def load(self) -> None:
+        try:
+            for dat_path in self.dat_paths:
+                for rom in iter_dat(dat_path):
+                    self.add(rom)
+        except (OSError, ET.ParseError) as e:
+            self.error = e
+        finally:
+            self.loaded.set()
+
+    def start(self) -> None:
+        threading.Thread(target=self.load, daemon=True).start()
+
+    def lookup(self, size, digests) -> list[int]:
+        """Return the ids of all DAT roms matching any digest, strongest first."""
+        self.loaded.wait()
+        if self.error:
+            raise self.error
+        matches = {}
+        for index, key in (
+            (self.by_sha1, digests.get("sha1")),
+            (self.by_md5, digests.get("md5")),
+            (self.by_crc, (digests.get("crc32"), size)),
+        ):
+            matches.update(dict.fromkeys(index.get(key, ())))
+        return list(matches)
+
+
+def match_job(file_path):
+    """Worker: digests of the whole file, plus the headerless ROM for iNES files."""
+    try:
+        size, digests, _ = hash_file(file_path)
+    except OSError as e:
+        return None, None, e
+    headerless = None
+    if file_path.lower().endswith(".nes"):
+        try:
+            rom = rom_digests(file_path)
+            headerless = (
+                int(rom["rom:size"]),
+                {algorithm: rom[f"rom:{algorithm}"] for algorithm in ALGORITHMS},
+            )
+        except ValueError:
+            pass
+    return (size, digests), headerless, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match files against DAT files")
+    parser.add_argument(
+        "-d", "--dat", action="append", required=True, help="DAT file (repeatable)"
+    )
+    parser.add_argument("paths", nargs="+", help="Files or directories to check")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Don't use the persistent hash cache"
+    )
+    args = parser.parse_args()
+
+    index = DatIndex(args.dat)
+    index.start()
+
+    files = list(iter_files(args.paths, recursive=True))
+    cache = None if args.no_cache else HashCache()
+    jobs = args.jobs or os.cpu_count() or 1
+
+    results = {}
+    misses = []
+    for file_path in files:
+        digests = None
+        if cache and not file_path.lower().endswith(".nes"):
+            try:
+                key = file_key(file_path)
+                digests = cache.lookup(key, ALGORITHMS)
+            except OSError:
+                pass
+        if digests is None:
+            misses.append(file_path)
+        else:
+            results[file_path] = ((key[1], digests), None, None)
+
+    executor = ProcessPoolExecutor(jobs) if jobs > 1 and len(misses) > 1 else None
+    hashed = (
+        executor.map(match_job, misses, chunksize=8)
+        if executor
+        else map(match_job, misses)
+    )
+
+    seen = set()
+    counts = {"have": 0, "mislabelled": 0, "unknown": 0}
+    try:
+        for file_path in files:
+            if file_path in results:
+                whole, headerless, error = results[file_path]
+            else:
+                whole, headerless, error = next(hashed)
+                if cache and whole:
+                    try:
+                        cache.store(file_key(file_path), whole[1])
+                    except OSError:
+                        pass
+            if error:
+                print(f"error: {file_path}: {error.strerror or error}")
+                continue
+
+            matches = index.lookup(*whole)
+            if not matches and headerless:
+                matches = index.lookup(*headerless)
+            if not matches:
+                counts["unknown"] += 1
+                print(f"unknown: {file_path}")
+                continue
+
+            seen.update(matches)
+            names = [index.roms[rom_id][1] for rom_id in matches]
+            base_name = os.path.basename(file_path)
+            if base_name in names or any(
+                name.replace("\\", "/").endswith("/" + base_name) for name in names
+            ):
+                counts["have"] += 1
+                print(f"have: {file_path}")
+            else:
+                counts["mislabelled"] += 1
+                game, name = index.roms[matches[0]][:2]
+                print(f"mislabelled: {file_path} -> {game}/{name}")
+    finally:
+        if executor:
+            executor.shutdown()
+        if cache:
+            cache.close()
+
+    missing = [rom for rom_id, rom in enumerate(index.roms) if rom_id not in seen]
+    for game, name, *_ in missing:
+        print(f"miss: {game}/{name}")
+
+    print(
+        f"have:{counts['have']} mislabelled:{counts['mislabelled']} "
+        f"unknown:{counts['unknown']} miss:{len(missing)}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
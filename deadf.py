@@ -20,9 +20,13 @@ import argparse
 import os
 import re
 import struct
+import time
 from binascii import crc_hqx
+from concurrent.futures import ProcessPoolExecutor
 from urllib import parse
 
+from fastcopy import copy_exact
+
 
 def escape_string(input_string: str) -> str:
     """
@@ -134,74 +138,102 @@ def punycode_encode(original_string: str) -> str:
     return original_string
 
 
-def main():
+def read_apple_double(input_file) -> tuple[dict, dict]:
     """
-    Main function for converting AppleDouble files to MacBinary format.
-
-    This function processes an input AppleDouble file and optionally a data
-    fork file, extracts necessary metadata, and converts the content to
-    MacBinary format. The output file is saved in the same directory as the
-    input file with a `.bin` extension.
-
-    Command-line Arguments:
-        input_file (str):            The path to the AppleDouble input file.
-        data_fork (str, optional):   The path to the data fork file. If not
-                                     provided, the data fork is extracted from
-                                     the input file.
-        --japanese (bool, optional): Flag indicating if Japanese filename
-                                     parsing should be used.
+    Reads an AppleDouble header.
 
-    Raises:
-        AssertionError: If the input file does not have the expected
-                        AppleDouble header.
-        FileNotFoundError: If the specified data fork file cannot be found.
+    Returns the small metadata entries as bytes, and the data (1) and
+    resource (2) fork entries as (offset, length) without reading them.
     """
-    argument_parser = argparse.ArgumentParser(
-        description="Convert AppleDouble files to MacBinary"
-    )
-    argument_parser.add_argument("input_file", type=str, help="Input file")
-    argument_parser.add_argument("data_fork", type=str, nargs="?", help="Data fork")
-    argument_parser.add_argument(
-        "--japanese", action="store_true", help="Japanese filename parsing"
-    )
-    arguments = argument_parser.parse_args()
-
-    with open(arguments.input_file, "rb") as input_file:
-        assert input_file.read(4) in [b"\x00\x05\x16\x07", b"\x00\x05\x16\x00"]
-        assert input_file.read(4) == b"\x00\x02\x00\x00"
-        input_file.seek(0x10, 1)
-        num_entries = struct.unpack(">H", input_file.read(2))[0]
-
-        entry_list = [
-            struct.unpack(">III", input_file.read(0xC)) for _ in range(num_entries)
-        ]
-
-        entry_data = {}
-        for entry_id, entry_offset, entry_length in entry_list:
+    assert input_file.read(4) in [b"\x00\x05\x16\x07", b"\x00\x05\x16\x00"]
+    assert input_file.read(4) == b"\x00\x02\x00\x00"
+    input_file.seek(0x10, 1)
+    num_entries = struct.unpack(">H", input_file.read(2))[0]
+
+    entry_list = [
+        struct.unpack(">III", input_file.read(0xC)) for _ in range(num_entries)
+    ]
+
+    file_size = os.fstat(input_file.fileno()).st_size
+    entry_data = {}
+    fork_ranges = {}
+    for entry_id, entry_offset, entry_length in entry_list:
+        entry_length = max(min(entry_length, file_size - entry_offset), 0)
+        if entry_id in (1, 2):
+            fork_ranges[entry_id] = (entry_offset, entry_length)
+        else:
             input_file.seek(entry_offset)
             entry_data[entry_id] = input_file.read(entry_length)
+    return entry_data, fork_ranges
 
-    data_fork_content = entry_data.get(1, b"")
-    if not data_fork_content and arguments.data_fork:
-        try:
-            with open(arguments.data_fork, "rb") as data_fork_file:
-                data_fork_content = data_fork_file.read()
-        except FileNotFoundError:
-            pass
 
-    resource_fork_content = entry_data.get(2, b"")
+def mac_file_name(
+    input_file_name: str, entry_data: dict, japanese: bool = False
+) -> tuple[bytes, str]:
+    """
+    Returns the Mac file name, raw and decoded, from the Real Name entry or
+    else from the AppleDouble file's own name.
+    """
     file_name_content = entry_data.get(3, b"")
 
     if not file_name_content:
-        file_name_content = os.path.basename(arguments.input_file).replace(".rsrc", "")
+        file_name_content = os.path.basename(input_file_name).replace(".rsrc", "")
         file_name_content = re.sub(r"^\._", "", file_name_content)
         file_name_content = parse.unquote_to_bytes(file_name_content)
         try:
-            encoding_type = "shift-jis" if arguments.japanese else "mac-roman"
+            encoding_type = "shift-jis" if japanese else "mac-roman"
             file_name_content = file_name_content.decode("utf-8").encode(encoding_type)
         except UnicodeDecodeError:
             pass
 
+    decoded_file_name = file_name_content.decode(
+        "shift-jis" if japanese else "macroman"
+    )
+    return file_name_content, decoded_file_name
+
+
+def output_path(input_file_name: str, japanese: bool = False) -> str:
+    """Returns the .bin path convert() would write for input_file_name."""
+    with open(input_file_name, "rb") as input_file:
+        entry_data, _ = read_apple_double(input_file)
+    _, decoded_file_name = mac_file_name(input_file_name, entry_data, japanese)
+    return os.path.join(os.path.dirname(input_file_name), f"{decoded_file_name}.bin")
+
+
+def convert(
+    input_file_name: str, data_fork: str | None = None, japanese: bool = False
+) -> tuple[str, tuple]:
+    """
+    Converts one AppleDouble file (plus optional data fork) to MacBinary.
+
+    Fork lengths come from the AppleDouble entries or stat(), so the header
+    is written first and the forks are then copied range-to-range with
+    fastcopy.copy_exact, keeping memory use constant whatever their size.
+
+    Returns the output path and the metadata printed by main().
+    """
+    with open(input_file_name, "rb") as input_file:
+        entry_data, fork_ranges = read_apple_double(input_file)
+
+    data_fork_source = None
+    if fork_ranges.get(1, (0, 0))[1]:
+        data_fork_source = (input_file_name, *fork_ranges[1])
+    elif data_fork:
+        try:
+            data_fork_source = (data_fork, 0, os.stat(data_fork).st_size)
+        except FileNotFoundError:
+            pass
+    data_fork_length = data_fork_source[2] if data_fork_source else 0
+
+    resource_fork_source = None
+    if fork_ranges.get(2, (0, 0))[1]:
+        resource_fork_source = (input_file_name, *fork_ranges[2])
+    resource_fork_length = resource_fork_source[2] if resource_fork_source else 0
+
+    file_name_content, decoded_file_name = mac_file_name(
+        input_file_name, entry_data, japanese
+    )
+
     try:
         creation_time, modification_time = struct.unpack(
             ">ii8x", entry_data.get(8, b"")
@@ -209,7 +241,7 @@ def main():
         creation_time += 3029529600  # AppleDouble is seconds from 2000-01-01
         modification_time += 3029529600
     except (TypeError, struct.error):
-        file_stat_info = os.stat(arguments.input_file)
+        file_stat_info = os.stat(input_file_name)
         creation_time = int(file_stat_info.st_ctime) + 2082844800
         modification_time = int(file_stat_info.st_mtime) + 2082844800
 
@@ -218,13 +250,10 @@ def main():
         ">4s4sH", finder_info[:10]
     )
 
-    decoded_file_name = file_name_content.decode(
-        "shift-jis" if arguments.japanese else "macroman"
-    )
-    print(
+    info = (
         decoded_file_name,
-        len(data_fork_content),
-        len(resource_fork_content),
+        data_fork_length,
+        resource_fork_length,
         creation_time,
         modification_time,
         file_type_code,
@@ -233,14 +262,14 @@ def main():
     )
 
     output_file_name = os.path.join(
-        os.path.dirname(arguments.input_file), f"{decoded_file_name}.bin"
+        os.path.dirname(input_file_name), f"{decoded_file_name}.bin"
     )
 
-    with open(output_file_name, "wb") as output_file:
+    with open(output_file_name, "wb", buffering=0) as output_file:
         output_file.write(
             convert_to_macbinary(
-                len(data_fork_content),
-                len(resource_fork_content),
+                data_fork_length,
+                resource_fork_length,
                 creation_time,
                 (modification_time if modification_time > 0 else 0),
                 file_type_code,
@@ -249,17 +278,211 @@ def main():
                 file_name_content,
             )
         )
-        if data_fork_content:
-            output_file.write(data_fork_content)
-            output_file.write(b"\x00" * (-len(data_fork_content) % 128))
-        if resource_fork_content:
-            output_file.write(resource_fork_content)
-            output_file.write(b"\x00" * (-len(resource_fork_content) % 128))
+        try:
+            for source in (data_fork_source, resource_fork_source):
+                if not source:
+                    continue
+                source_path, offset, length = source
+                with open(source_path, "rb") as source_file:
+                    copy_exact(
+                        source_file.fileno(), output_file.fileno(), offset, length
+                    )
+                output_file.write(b"\x00" * (-length % 128))
+        except EOFError as e:
+            # The header already promises these fork lengths
+            os.unlink(output_file_name)
+            raise EOFError(f"{source_path}: fork cut short: {e}") from None
 
     os.utime(
         output_file_name,
         (modification_time - 2082844800, modification_time - 2082844800),
     )
+    return output_file_name, info
+
+
+def find_pairs(root: str) -> list[tuple[str, str | None]]:
+    """
+    Pairs every "._name" and "name.rsrc" sidecar under root with its data
+    fork "name", if there is one.
+    """
+    pairs = []
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        names = set(files)
+        for name in sorted(files):
+            if name.startswith("._"):
+                data_name = name[2:]
+            elif name.endswith(".rsrc"):
+                data_name = name[: -len(".rsrc")]
+            else:
+                continue
+            data_fork = os.path.join(directory, data_name)
+            pairs.append(
+                (
+                    os.path.join(directory, name),
+                    data_fork if data_name in names else None,
+                )
+            )
+    return pairs
+
+
+def is_up_to_date(output_file_name: str, inputs: list[str]) -> bool:
+    """
+    True if output_file_name was written after every input last changed.
+
+    convert() sets the output's mtime to the Mac modification date, so the
+    output's ctime (when that happened) is what gets compared.
+    """
+    try:
+        written = os.stat(output_file_name).st_ctime
+        return all(os.stat(path).st_mtime <= written for path in inputs)
+    except FileNotFoundError:
+        return False
+
+
+def plan_outputs(
+    pairs: list[tuple[str, str | None]], japanese: bool
+) -> tuple[list[tuple[str, str | None, bool, str]], list[tuple[str, str]]]:
+    """
+    Works out every pair's .bin path from its AppleDouble header.
+
+    Returns (jobs, problems). Sidecars that can't be read, or whose outputs
+    would collide (say "._X" and "X.rsrc" both naming X), are left out and
+    reported as (input, reason) problems instead of racing in the pool.
+    """
+    by_output = {}
+    problems = []
+    for input_file_name, data_fork in pairs:
+        try:
+            output_file_name = output_path(input_file_name, japanese)
+        except (AssertionError, OSError, struct.error, UnicodeDecodeError) as e:
+            problems.append((input_file_name, str(e) or "not AppleDouble"))
+            continue
+        by_output.setdefault(output_file_name, []).append((input_file_name, data_fork))
+
+    jobs = []
+    for output_file_name, inputs in by_output.items():
+        if len(inputs) > 1:
+            names = ", ".join(input_file_name for input_file_name, _ in inputs)
+            problems.extend(
+                (input_file_name, f"{output_file_name} would be written by {names}")
+                for input_file_name, _ in inputs
+            )
+            continue
+        input_file_name, data_fork = inputs[0]
+        jobs.append((input_file_name, data_fork, japanese, output_file_name))
+    return jobs, problems
+
+
+def convert_job(job: tuple[str, str | None, bool, str]):
+    """Worker: converts one pair, returning (input, output, info, seconds, error)."""
+    input_file_name, data_fork, japanese, output_file_name = job
+    start = time.perf_counter()
+    try:
+        inputs = [input_file_name] + ([data_fork] if data_fork else [])
+        if is_up_to_date(output_file_name, inputs):
+            return input_file_name, output_file_name, None, 0.0, None
+        output_file_name, info = convert(input_file_name, data_fork, japanese)
+    except (AssertionError, EOFError, OSError, struct.error, UnicodeDecodeError) as e:
+        return input_file_name, None, None, time.perf_counter() - start, e
+    return input_file_name, output_file_name, info, time.perf_counter() - start, None
+
+
+def convert_tree(root: str, japanese: bool, jobs: int) -> None:
+    """Converts every AppleDouble sidecar under root, across a process pool."""
+    start = time.perf_counter()
+    work, problems = plan_outputs(find_pairs(root), japanese)
+    counts = {"converted": 0, "skipped": 0, "failed": len(problems)}
+    total_bytes = 0
+    for input_file_name, reason in problems:
+        print(f"{input_file_name}: failed: {reason}")
+
+    if jobs > 1 and len(work) > 1:
+        executor = ProcessPoolExecutor(jobs)
+        results = executor.map(convert_job, work, chunksize=16)
+    else:
+        executor = None
+        results = map(convert_job, work)
+    try:
+        for input_file_name, output_file_name, info, elapsed, error in results:
+            if error:
+                counts["failed"] += 1
+                print(f"{input_file_name}: failed: {str(error) or 'not AppleDouble'}")
+            elif info is None:
+                counts["skipped"] += 1
+            else:
+                counts["converted"] += 1
+                total_bytes += info[1] + info[2]
+                print(f"{input_file_name} -> {output_file_name} ({elapsed:.3f}s)")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{counts['converted']} converted, {counts['skipped']} up to date, "
+        f"{counts['failed']} failed; {total_bytes} fork bytes in {elapsed:.2f}s"
+    )
+
+
+def main():
+    """
+    Main function for converting AppleDouble files to MacBinary format.
+
+    This function processes an input AppleDouble file and optionally a data
+    fork file, extracts necessary metadata, and converts the content to
+    MacBinary format. The output file is saved in the same directory as the
+    input file with a `.bin` extension.
+
+    Command-line Arguments:
+        input_file (str):            The path to the AppleDouble input file.
+        data_fork (str, optional):   The path to the data fork file. If not
+                                     provided, the data fork is extracted from
+                                     the input file.
+        --japanese (bool, optional): Flag indicating if Japanese filename
+                                     parsing should be used.
+        --recursive (bool, optional): Treat input_file as a directory and
+                                     convert every sidecar in it.
+        --jobs (int, optional):      Worker processes for --recursive.
+
+    Raises:
+        AssertionError: If the input file does not have the expected
+                        AppleDouble header.
+        FileNotFoundError: If the specified data fork file cannot be found.
+    """
+    argument_parser = argparse.ArgumentParser(
+        description="Convert AppleDouble files to MacBinary"
+    )
+    argument_parser.add_argument("input_file", type=str, help="Input file")
+    argument_parser.add_argument("data_fork", type=str, nargs="?", help="Data fork")
+    argument_parser.add_argument(
+        "--japanese", action="store_true", help="Japanese filename parsing"
+    )
+    argument_parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Convert every ._name / name.rsrc sidecar under input_file",
+    )
+    argument_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Worker processes for --recursive (0 = one per CPU)",
+    )
+    arguments = argument_parser.parse_args()
+
+    if arguments.recursive:
+        convert_tree(
+            arguments.input_file,
+            arguments.japanese,
+            arguments.jobs or os.cpu_count() or 1,
+        )
+        return
+
+    _, info = convert(arguments.input_file, arguments.data_fork, arguments.japanese)
+    print(*info)
 
 
 if __name__ == "__main__":
@@ -4,17 +4,29 @@ from sys import argv
 import requests
 from blake3 import blake3
 
+from hashcache import HashCache, cached_digests
+
+
+def blake3_file(path):
+    h = blake3()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            h.update(chunk)
+    return {"blake3": h.hexdigest()}
+
+
 files = argv[1:]
 if not files:
     print("Usage: discmaster_rename.py <file1> <file2> ...")
     exit(1)
 
+cache = HashCache()
 for f in files:
-    with open(f, "rb") as file:
-        b = blake3(file.read()).hexdigest()
+    b = cached_digests(cache, f, ["blake3"], lambda: blake3_file(f))["blake3"]
     r = requests.get(
         f"https://discmaster.textfiles.com/search?b3sum={b}&outputAs=json"
     ).json()
     filenames = [i["filename"] for i in r]
     filename = max(set(filenames), key=filenames.count)
     shutil.move(f, filename)
+cache.close()
@@ -1,20 +1,27 @@
 #!/usr/bin/env python3
+import os
 from pathlib import Path
-from struct import unpack
 from sys import argv
 
-
-def detect_extension(data: bytes) -> str:
-    """Detect file extension from magic bytes."""
-    if data.startswith(b"RIFF") and len(data) >= 12 and data[8:12] == b"WAVE":
-        return ".wav"
-    if data.startswith(b"FORM") and len(data) >= 12 and data[8:12] == b"XDIR":
-        return ".xmi"
-    if data.startswith(b"UN05"):
-        return ".uni"
-    if data.startswith(b"Creative Voice File"):
-        return ".voc"
-    return ".bin"
+from archivespec import (
+    MAGIC_SIZE,
+    ArchiveError,
+    ArchiveSpec,
+    detect_extension,
+    map_archive,
+    parse_toc,
+)
+from fastcopy import extract_member
+
+DAT = ArchiveSpec(
+    header="<8sI",
+    header_fields=("magic", "count"),
+    magic=b"Axia DAT",
+    entry="<I",
+    fields=("offset",),
+    name=None,
+    size=None,
+)
 
 
 def main():
@@ -26,36 +33,26 @@ def main():
     output_dir = Path(argv[2]) if len(argv) > 2 else Path("extracted")
 
     with open(input_path, "rb") as f:
-        # Validate header
-        if f.read(8) != b"Axia DAT":
+        try:
+            with map_archive(input_path) as archive:
+                _, members = parse_toc(DAT, archive)
+        except ArchiveError:
             print("Error: Invalid file format")
             exit(1)
-
-        # Read metadata
-        num_files = unpack("<I", f.read(4))[0]
-        file_offsets = unpack(f"<{num_files}I", f.read(num_files * 4))
+        num_files = len(members)
 
         print(f"Found {num_files} files in archive")
 
         # Create output directory
         output_dir.mkdir(exist_ok=True)
 
-        # Get file size for last file calculation
-        f.seek(0, 2)
-        file_size = f.tell()
-
         # Extract files
-        for i in range(num_files):
-            start = file_offsets[i]
-            size = (file_offsets[i + 1] if i < num_files - 1 else file_size) - start
-
-            # Read file data
-            f.seek(start)
-            data = f.read(size)
+        for i, (_, start, size, _) in enumerate(members):
 
-            # Determine extension and write file
-            output_file = output_dir / f"file_{i:04d}{detect_extension(data)}"
-            output_file.write_bytes(data)
+            # Determine extension from the first bytes and copy the file
+            head = os.pread(f.fileno(), min(size, MAGIC_SIZE), start)
+            output_file = output_dir / f"file_{i:04d}{detect_extension(head)}"
+            extract_member(f.fileno(), output_file, start, size)
 
             print(f"{output_file.name} ({size:,})")
 
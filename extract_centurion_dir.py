@@ -2,27 +2,34 @@
 # Extract files from .DIR and .DAT files used in the game "Centurion: Defender of Rome" (1990)
 # Usage: python3 extract_centurion_dir.py <filename.DIR>
 
-from struct import unpack
+import os
 from sys import argv
 
 import lzss  # type: ignore
 
-with open(argv[1], "rb") as dir_file, open(
-    argv[1].replace(".DIR", ".DAT"), "rb"
-) as dat_file:
-    while True:
-        offset_bytes = dir_file.read(4)
-        if not offset_bytes:
-            break
-        offset = unpack("<I", offset_bytes)[0]
-        file_size = unpack("<H", dir_file.read(2))[0]
-        file_name = dir_file.read(13).decode().split("\0")[0]
-        file_attributes = dir_file.read(1)[0]
-        print(f"{offset:08x} {file_size:04x} {file_name} {file_attributes:02x}")
-        dat_file.seek(offset)
-        file_data = dat_file.read(file_size)
-        if file_attributes & 0x80:
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_member
+
+# The .DIR file is nothing but entries; the data is in the .DAT file
+DIR = ArchiveSpec(
+    count=None,
+    entry="<IH13sB",
+    fields=("offset", "size", "name", "attributes"),
+    encoding="utf-8",
+    compressed=lambda entry: entry["attributes"] & 0x80 != 0,
+    extra=("attributes",),
+)
+
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(DIR, archive)
+with open(argv[1].replace(".DIR", ".DAT"), "rb") as dat_file:
+    for file_name, offset, file_size, compressed, attributes in members:
+        print(f"{offset:08x} {file_size:04x} {file_name} {attributes:02x}")
+        if compressed:
+            file_data = os.pread(dat_file.fileno(), file_size, offset)
             file_data = lzss.decompress(file_data[4:], 0x20202020)
             file_name = file_name.replace(".LZW", ".BIN")
-        with open(file_name, "wb") as output_file:
-            output_file.write(file_data)
+            with open(file_name, "wb") as output_file:
+                output_file.write(file_data)
+        else:
+            extract_member(dat_file.fileno(), file_name, offset, file_size)
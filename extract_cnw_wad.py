@@ -1,7 +1,9 @@
 import argparse
 import os
 from pathlib import Path
-from struct import unpack
+
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
 
 """
 Extract files from a Q2Data WAD archive. (Conquest of the New World)
@@ -9,29 +11,27 @@ Usage:
     python extract_wad.py <wad_file> [-o <output_dir>]
 """
 
+WAD = ArchiveSpec(
+    header="<IB",
+    header_fields=("unknown", "count"),
+    entry="<II",
+    fields=("offset", "size"),
+    name_follows=True,
+)
+
 
 def extract_wad(filename, output_dir):
-    files = []
+    with map_archive(filename) as archive:
+        _, files = parse_toc(WAD, archive)
+    print(f"Number of files: {len(files)}")
+    for i, (name, offset, size, _) in enumerate(files):
+        print(f"File {i}: {name} (offset: {offset}, size: {size})")
+
     with open(filename, "rb") as file:
-        _, num_files = unpack("<IB", file.read(5))
-        print(f"Number of files: {num_files}")
-        for i in range(num_files):
-            offset, size = unpack("<II", file.read(8))
-            name_bytes = []
-            while True:
-                c = file.read(1)
-                if c == b"\0":
-                    break
-                name_bytes.append(c)
-            name = b"".join(name_bytes).decode("ascii")
-            print(f"File {i}: {name} (offset: {offset}, size: {size})")
-            files.append((name, offset, size))
-
-        for name, offset, size in files:
-            file.seek(offset)
-            data = file.read(size)
-            with open(output_dir / name, "wb") as f:
-                f.write(data)
+        extract_members(
+            file.fileno(),
+            ((output_dir / name, offset, size) for name, offset, size, _ in files),
+        )
 
 
 if __name__ == "__main__":
@@ -1,13 +1,20 @@
-from struct import unpack
 from sys import argv
 
-f = open(argv[1], "rb")
-num_files = f.read(1)[0]
-for _ in range(num_files):
-    unk, offset, size = unpack("<?II", f.read(9))
-    tmp = f.tell()
-    f.seek(offset)
-    with open(f"{offset:08X}.bin", "wb") as of:
-        of.write(f.read(size))
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
 
-    f.seek(tmp)
+MLK = ArchiveSpec(
+    header="<B",
+    header_fields=("count",),
+    entry="<?II",
+    fields=("unknown", "offset", "size"),
+    name=None,
+)
+
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(MLK, archive)
+with open(argv[1], "rb") as f:
+    extract_members(
+        f.fileno(),
+        ((f"{offset:08X}.bin", offset, size) for _, offset, size, _ in members),
+    )
@@ -1,15 +1,20 @@
-from struct import unpack
 from sys import argv
 
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
+
+ARC = ArchiveSpec(
+    header="<4sH",
+    header_fields=("magic", "count"),
+    magic=b"ARC1",
+    entry="<14sII",
+    fields=("name", "offset", "size"),
+)
+
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(ARC, archive)
 with open(argv[1], "rb") as f:
-    assert f.read(4) == b"ARC1"
-    num_files = unpack("<H", f.read(2))[0]
-    for _ in range(num_files):
-        name = f.read(14).split(b"\0", 1)[0].decode("ascii")
-        offset, size = unpack("<II", f.read(8))
-        tmp = f.tell()
-        f.seek(offset)
-        data = f.read(size)
-        f.seek(tmp)
-        with open(f"extracted/{name}", "wb") as out:
-            out.write(data)
+    extract_members(
+        f.fileno(),
+        ((f"extracted/{name}", offset, size) for name, offset, size, _ in members),
+    )
@@ -1,23 +1,23 @@
-from struct import unpack
 from sys import argv
 
-f = open(argv[1], "rb")
-num_files = unpack("<H", f.read(2))[0]
-signature = f.read(6)
-filever = f.read(8)
-assert (
-    signature == b"FILPAC"
-), f"Expected FILPAC, got {signature.decode()} {filever.decode()}"
-print(f"{signature.decode()} {filever.decode()}")
-for _ in range(num_files):
-    filename = f.read(12).decode("ascii").split("\x00")[0]
-    fsize_hi, fsize_lo, offset_hi, offset_lo = unpack("<HHHH", f.read(8))
-    f.seek(12, 1)
-    fsize = fsize_hi << 16 | fsize_lo
-    offset = offset_hi << 16 | offset_lo
-    tmp = f.tell()
-    f.seek(offset)
-    with open("extracted/" + filename, "wb") as of:
-        of.write(f.read(fsize))
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
 
-    f.seek(tmp)
+PKF = ArchiveSpec(
+    header="<H6s8s",
+    header_fields=("count", "magic", "version"),
+    magic=b"FILPAC",
+    entry="<12sHHHH12x",
+    fields=("name", "size_hi", "size_lo", "offset_hi", "offset_lo"),
+    offset=lambda entry: entry["offset_hi"] << 16 | entry["offset_lo"],
+    size=lambda entry: entry["size_hi"] << 16 | entry["size_lo"],
+)
+
+with map_archive(argv[1]) as archive:
+    header, members = parse_toc(PKF, archive)
+print(f"{header['magic'].decode()} {header['version'].decode()}")
+with open(argv[1], "rb") as f:
+    extract_members(
+        f.fileno(),
+        (("extracted/" + name, offset, size) for name, offset, size, _ in members),
+    )
@@ -1,17 +1,21 @@
-from struct import unpack
 from sys import argv
 
-f = open(argv[1], "rb")
-assert f.read(4) == b"FLDF"
-version = f.read(4).decode()
-header_len, num_files = unpack("<II", f.read(8))
-f.seek(header_len)
-for _ in range(num_files):
-    fname, offset, size = unpack("<12sII", f.read(20))
-    print(fname, offset, size)
-    tmp = f.tell()
-    f.seek(offset)
-    with open(fname.split(b"\x00", 1)[0].decode(), "wb") as of:
-        of.write(f.read(size))
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
+
+FLD = ArchiveSpec(
+    header="<4s4sII",
+    header_fields=("magic", "version", "header_len", "count"),
+    magic=b"FLDF",
+    toc_offset=lambda header, _: header["header_len"],
+    entry="<12sII",
+    fields=("name", "offset", "size"),
+    encoding="utf-8",
+)
 
-    f.seek(tmp)
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(FLD, archive)
+for fname, offset, size, _ in members:
+    print(fname, offset, size)
+with open(argv[1], "rb") as f:
+    extract_members(f.fileno(), (member[:3] for member in members))
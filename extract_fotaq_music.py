@@ -1,22 +1,29 @@
 #!/usr/bin/env python3
+import os
 from pathlib import Path
-from struct import unpack
 from sys import argv
 
-
-def detect_extension(data: bytes) -> str:
-    """Detect file extension from magic bytes."""
-    if data.startswith(b"RIFF") and len(data) >= 12 and data[8:12] == b"WAVE":
-        return ".wav"
-    if data.startswith(b"FORM") and len(data) >= 12 and data[8:12] == b"XDIR":
-        return ".xmi"
-    if data.startswith(b"UN05"):
-        return ".uni"
-    if data.startswith(b"Creative Voice File"):
-        return ".voc"
-    if data.startswith(b"MThd"):
-        return ".mid"
-    return ".bin"
+from archivespec import (
+    MAGICS,
+    MAGIC_SIZE,
+    ArchiveSpec,
+    detect_extension,
+    map_archive,
+    parse_toc,
+)
+from fastcopy import extract_member
+
+# Offsets are stored as a low nibble and a paragraph number
+MUSIC = ArchiveSpec(
+    header="<H",
+    header_fields=("count",),
+    entry="<HH",
+    fields=("low", "paragraph"),
+    name=None,
+    offset=lambda entry: entry["paragraph"] << 4 | entry["low"],
+    size=None,
+)
+MUSIC_MAGICS = MAGICS + ((b"MThd", ".mid"),)
 
 
 def main():
@@ -28,35 +35,23 @@ def main():
     output_dir = Path(argv[2]) if len(argv) > 2 else Path("extracted")
 
     with open(input_path, "rb") as f:
-        # Read metadata
-        num_files = unpack("<H", f.read(2))[0]
-        offsets = unpack(f"<{num_files*2}H", f.read(num_files * 4))
-        file_offsets = []
-        for i in range(0, num_files * 2, 2):
-            file_offsets.append(offsets[i + 1] << 4 | offsets[i])
-        print([hex(i) for i in file_offsets])
+        with map_archive(input_path) as archive:
+            _, members = parse_toc(MUSIC, archive)
+        num_files = len(members)
+        print([hex(offset) for _, offset, _, _ in members])
 
         print(f"Found {num_files} files in archive")
 
         # Create output directory
         output_dir.mkdir(exist_ok=True)
 
-        # Get file size for last file calculation
-        f.seek(0, 2)
-        file_size = f.tell()
-
         # Extract files
-        for i in range(num_files):
-            start = file_offsets[i]
-            size = (file_offsets[i + 1] if i < num_files - 1 else file_size) - start
-
-            # Read file data
-            f.seek(start)
-            data = f.read(size)
+        for i, (_, start, size, _) in enumerate(members):
 
-            # Determine extension and write file
-            output_file = output_dir / f"file_{i:04d}{detect_extension(data)}"
-            output_file.write_bytes(data)
+            # Determine extension from the first bytes and copy the file
+            head = os.pread(f.fileno(), min(size, MAGIC_SIZE), start)
+            output_file = output_dir / f"file_{i:04d}{detect_extension(head, MUSIC_MAGICS)}"
+            extract_member(f.fileno(), output_file, start, size)
 
             print(f"{output_file.name} ({size:,})")
 
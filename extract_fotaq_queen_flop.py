@@ -1,5 +1,7 @@
 from pathlib import Path
 
+from fastcopy import extract_members
+
 table = (
     ("1000SSSS.SB", 0x0, 0x27FE),
     ("1001SSSS.SB", 0x27FE, 0x7AF8),
@@ -1082,6 +1084,6 @@ table = (
 output_dir = Path("extracted")
 output_dir.mkdir(exist_ok=True)
 with open("QUEEN.1", "rb") as f:
-    for fn, offset, size in table:
-        f.seek(offset)
-        (output_dir / fn).write_bytes(f.read(size))
+    extract_members(
+        f.fileno(), ((output_dir / fn, offset, size) for fn, offset, size in table)
+    )
@@ -1,24 +1,32 @@
+import os
 from pathlib import Path
-from struct import unpack
 from sys import argv
 
 # pip install lzss
 # https://pypi.org/project/lzss/
 from lzss import decompress  # type: ignore
 
+from archivespec import (
+    MAGIC_SIZE,
+    ArchiveSpec,
+    detect_extension,
+    map_archive,
+    parse_toc,
+)
+from fastcopy import extract_member
 
-def detect_extension(data: bytes) -> str:
-    """Detect file extension from magic bytes."""
-    if data.startswith(b"RIFF") and len(data) >= 12 and data[8:12] == b"WAVE":
-        return ".wav"
-    if data.startswith(b"FORM") and len(data) >= 12 and data[8:12] == b"XDIR":
-        return ".xmi"
-    if data.startswith(b"UN05"):
-        return ".uni"
-    if data.startswith(b"Creative Voice File"):
-        return ".voc"
-    return ".bin"
-
+# Offsets carry an "uncompressed" flag in bit 30. Each member starts with
+# its decompressed size.
+FPF = ArchiveSpec(
+    header="<I2x",
+    header_fields=("count",),
+    entry="<I",
+    fields=("offset",),
+    name=None,
+    offset=lambda entry: entry["offset"] & 0x3FFFFFFF,
+    compressed=lambda entry: not entry["offset"] & 0x40000000,
+    size=None,
+)
 
 def main():
     if len(argv) < 2:
@@ -29,36 +37,25 @@ def main():
     output_dir = Path(argv[2]) if len(argv) > 2 else Path("extracted")
 
     with open(input_path, "rb") as f:
-        num_files = unpack("<I", f.read(4))[0]
-        f.read(2)
-        file_offsets = unpack(f"<{num_files}I", f.read(num_files * 4))
+        with map_archive(input_path) as archive:
+            _, members = parse_toc(FPF, archive)
+        num_files = len(members)
         print(f"Found {num_files} files in archive")
         output_dir.mkdir(exist_ok=True)
-        f.seek(0, 2)
-        file_size = f.tell()
-        for i in range(num_files):
-            offset = file_offsets[i]
-
-            # Check if uncompressed flag is set
-            is_uncompressed = offset & 0x40000000
-            offset &= 0x3FFFFFFF  # Mask off compression flag
+        for i, (_, offset, size, compressed) in enumerate(members):
+            is_uncompressed = not compressed
             start = offset + 4  # +4 to strip decompressed size
-            next_offset = (
-                file_offsets[i + 1] & 0x3FFFFFFF if i < num_files - 1 else file_size
-            )
-            size = next_offset - start
-
-            # Read file data
-            f.seek(start)
-            data = f.read(size)
-
-            # Decompress if needed
-            if not is_uncompressed:
-                data = decompress(data)
+            size -= 4
 
-            # Determine extension and write file
-            output_file = output_dir / f"file_{i:04d}{detect_extension(data)}"
-            output_file.write_bytes(data)
+            if is_uncompressed:
+                # Copy straight across; only the magic is needed for the name
+                head = os.pread(f.fileno(), min(size, MAGIC_SIZE), start)
+                output_file = output_dir / f"file_{i:04d}{detect_extension(head)}"
+                extract_member(f.fileno(), output_file, start, size)
+            else:
+                data = decompress(os.pread(f.fileno(), size, start))
+                output_file = output_dir / f"file_{i:04d}{detect_extension(data)}"
+                output_file.write_bytes(data)
 
             comp_status = ("un" if is_uncompressed else "") + "compressed"
             print(f"{output_file.name} ({size:,} bytes, {comp_status})")
@@ -1,8 +1,21 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from struct import unpack
 from sys import argv
 
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_member
+
+# The last entry is a sentinel with its offset set to the file size
+DAT = ArchiveSpec(
+    header="<I",
+    header_fields=("count",),
+    count=lambda header: header["count"] - 1,
+    entry="<I13s",
+    fields=("offset", "name"),
+    encoding="utf-8",
+    size=None,
+)
+
 
 def main():
     if len(argv) < 2:
@@ -13,36 +26,19 @@ def main():
     output_dir = Path(argv[2]) if len(argv) > 2 else Path("extracted")
 
     with open(input_path, "rb") as f:
-        # Read metadata
-        num_files = (
-            unpack("<I", f.read(4))[0] - 1
-        )  # last entry has the offset set to the file size
-        toc = []
-        for _ in range(num_files):
-            toc.append(unpack("<I13s", f.read(17)))
+        with map_archive(input_path) as archive:
+            _, members = parse_toc(DAT, archive)
+        num_files = len(members)
 
         print(f"Found {num_files} files in archive")
 
         # Create output directory
         output_dir.mkdir(exist_ok=True)
 
-        # Get file size for last file calculation
-        f.seek(0, 2)
-        file_size = f.tell()
-
         # Extract files
-        for i in range(num_files):
-            start, file_name = toc[i]
-            file_name = file_name.split(b"\x00")[0].decode()
-            size = (toc[i + 1][0] if i < num_files - 1 else file_size) - start
-
-            # Read file data
-            f.seek(start)
-            data = f.read(size)
-
-            # Determine extension and write file
+        for file_name, start, size, _ in members:
             output_file = output_dir / file_name
-            output_file.write_bytes(data)
+            extract_member(f.fileno(), output_file, start, size)
 
             print(f"{output_file.name} ({size:,})")
 
@@ -1,20 +1,20 @@
-from struct import unpack
 from sys import argv
 
-SIGNATURE = b"KAPF"  # FPAK in little-endian
-FNAME_LEN = 16
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
 
-f = open(argv[1], "rb")
-sig, num_files = unpack("<4sI", f.read(8))
-assert sig == SIGNATURE, f"Invalid signature: {sig!r}"
-print(num_files)
-for _ in range(num_files):
-    fname, offset, fsize = unpack("<16sII", f.read(24))
-    fname = fname.decode("ascii").rstrip("\x00")
-    print(fname, offset, fsize)
-    tmp = f.tell()
-    f.seek(offset)
-    with open(fname, "wb") as of:
-        of.write(f.read(fsize))
+FPK = ArchiveSpec(
+    header="<4sI",
+    header_fields=("magic", "count"),
+    magic=b"KAPF",  # FPAK in little-endian
+    entry="<16sII",
+    fields=("name", "offset", "size"),
+)
 
-    f.seek(tmp)
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(FPK, archive)
+print(len(members))
+for fname, offset, fsize, _ in members:
+    print(fname, offset, fsize)
+with open(argv[1], "rb") as f:
+    extract_members(f.fileno(), (member[:3] for member in members))
@@ -1,16 +1,22 @@
 from sys import argv
 
+from archivespec import ArchiveSpec, map_archive, parse_toc
+from fastcopy import extract_members
 
-f = open(argv[1], "rb")
-f.seek(-2, 2)
-num_files = int.from_bytes(f.read(2), "little")
-f.seek(num_files * -0x15 - 2, 2)
-for _ in range(num_files):
-    size = int.from_bytes(f.read(4), "little")
-    offset = int.from_bytes(f.read(4), "little")
-    filename = f.read(13).split(b"\x00", 1)[0].decode("ascii")
-    cur = f.tell()
-    f.seek(offset)
-    with open(f"extracted/{filename}", "wb") as of:
-        of.write(f.read(size))
-    f.seek(cur)
+# The file count is the last word, right after the table
+LIB = ArchiveSpec(
+    header="<H",
+    header_fields=("count",),
+    header_offset=-2,
+    toc_offset=lambda header, file_size: file_size - 2 - header["count"] * 0x15,
+    entry="<II13s",
+    fields=("size", "offset", "name"),
+)
+
+with map_archive(argv[1]) as archive:
+    _, members = parse_toc(LIB, archive)
+with open(argv[1], "rb") as f:
+    extract_members(
+        f.fileno(),
+        ((f"extracted/{name}", offset, size) for name, offset, size, _ in members),
+    )
@@ -0,0 +1,116 @@
+"""
+Copy byte ranges between files without pulling them through Python.
+
+copy_range() uses os.copy_file_range, then os.sendfile, and finally plain
+pread/write in large chunks when neither is available for the pair of
+files involved. Memory use is bounded by CHUNK_SIZE in every case.
+
+extract_member()/extract_members() are the back end of the extract_*
+scripts for uncompressed members: each member is copied straight from
+the archive to its own file. The archive's file position is not moved.
+"""
+import errno
+import os
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Errors meaning "not supported here", after which the next method is tried.
+UNSUPPORTED = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.ENOTSUP,
+}
+
+
+def copy_range(
+    src_fd: int, dst_fd: int, offset: int, length: int, method: str | None = None
+) -> int:
+    """
+    Copies length bytes of src_fd starting at offset to dst_fd's position.
+
+    dst_fd's file position is advanced; src_fd's is left alone. method can
+    force "copy_file_range", "sendfile" or "buffered". Returns the number of
+    bytes copied, which is less than length only if src_fd hits EOF.
+
+    Some filesystems (overlayfs, FUSE, some NFS setups) make the kernel
+    calls return 0 before EOF, so a 0 from them hands the rest of the range
+    to the pread/write loop, which alone decides where EOF is.
+    """
+    copied = 0
+    if method in (None, "copy_file_range") and hasattr(os, "copy_file_range"):
+        try:
+            while copied < length:
+                n = os.copy_file_range(src_fd, dst_fd, length - copied, offset + copied)
+                if not n:
+                    break
+                copied += n
+            else:
+                return copied
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or method:
+                raise
+
+    if method in (None, "sendfile") and hasattr(os, "sendfile"):
+        try:
+            while copied < length:
+                n = os.sendfile(dst_fd, src_fd, offset + copied, length - copied)
+                if not n:
+                    break
+                copied += n
+            else:
+                return copied
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or method:
+                raise
+
+    while copied < length:
+        chunk = os.pread(src_fd, min(CHUNK_SIZE, length - copied), offset + copied)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+        copied += len(chunk)
+    return copied
+
+
+def copy_exact(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    """copy_range() for callers that need every byte: raises EOFError if short."""
+    copied = copy_range(src_fd, dst_fd, offset, length)
+    if copied != length:
+        raise EOFError(f"only {copied} of {length} bytes at {offset:#x} could be read")
+    return copied
+
+
+def copy_file(src_path: str, dst_fd: int, offset: int = 0, length: int = -1) -> int:
+    """copy_range() from a path; length -1 copies to the end of the file."""
+    with open(src_path, "rb") as src:
+        if length < 0:
+            length = os.fstat(src.fileno()).st_size - offset
+        return copy_range(src.fileno(), dst_fd, offset, length)
+
+
+def extract_member(
+    src_fd: int, path, offset: int, size: int, method: str | None = None
+) -> int:
+    """copy_range() one archive member into a new file at path."""
+    dst_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        return copy_range(src_fd, dst_fd, offset, size, method)
+    finally:
+        os.close(dst_fd)
+
+
+def extract_members(src_fd: int, members, method: str | None = None) -> int:
+    """
+    extract_member() for every (path, offset, size) in members.
+
+    Returns the total number of bytes copied.
+    """
+    return sum(
+        extract_member(src_fd, path, offset, size, method)
+        for path, offset, size in members
+    )
@@ -1,8 +1,16 @@
 # Checksum ROM files and print their size, crc32, md5, sha1, and sha256 hashes.
 
+import argparse
 import hashlib
-import sys
+import os
+import time
 import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from hashcache import HashCache, file_key
+
+CHUNK_SIZE = 1024 * 1024
+ALGORITHMS = ("crc32", "md5", "sha1", "sha256")
 
 
 def sha1sum(data):
@@ -27,6 +35,55 @@ def crc32sum(data):
     return f"{zlib.crc32(data) & 0xFFFFFFFF:08x}"
 
 
+class Crc32:
+    """hashlib-style wrapper around zlib.crc32 so it can be fed incrementally."""
+
+    def __init__(self):
+        self.crc = 0
+
+    def update(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+
+    def hexdigest(self):
+        return f"{self.crc & 0xFFFFFFFF:08x}"
+
+
+def new_hashers(algorithms=ALGORITHMS):
+    return {
+        name: Crc32() if name == "crc32" else hashlib.new(name) for name in algorithms
+    }
+
+
+def hash_stream(f, algorithms=ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """
+    Feed every requested digest from a single pass over a binary file object.
+
+    Memory use is bounded by chunk_size regardless of the size of the file.
+    Returns (size, {algorithm: hexdigest}).
+    """
+    hashers = new_hashers(algorithms)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    size = 0
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        chunk = view[:n]
+        for h in hashers.values():
+            h.update(chunk)
+        size += n
+    return size, {name: h.hexdigest() for name, h in hashers.items()}
+
+
+def hash_file(file_path, algorithms=ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """Hash a file in one streaming pass. Returns (size, digests, elapsed)."""
+    start = time.perf_counter()
+    with open(file_path, "rb", buffering=0) as f:
+        size, digests = hash_stream(f, algorithms, chunk_size)
+    return size, digests, time.perf_counter() - start
+
+
 def human_readable_size(size):
     for unit in ["B", "KB", "MB", "GB"]:
         if size < 1024:
@@ -39,17 +96,124 @@ def human_readable_size(size):
     return f"{size:.2f}TB"
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 hash.py <path_to_file>")
-        sys.exit(1)
+def throughput(size, elapsed):
+    return size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+
+
+def format_result(file_path, size, digests, elapsed):
+    fields = " ".join(f"{name}:{digest}" for name, digest in digests.items())
+    speed = "cached" if elapsed is None else f"{throughput(size, elapsed):.1f} MB/s"
+    return f"{file_path}: size:{human_readable_size(size)} {fields} ({speed})"
+
 
-    for file_path in sys.argv[1:]:
-        with open(file_path, "rb") as f:
-            rom_data = f.read()
+def iter_files(paths, recursive=False):
+    """Expand the command line into a sorted, de-duplicated list of files."""
+    seen = set()
+    for file_path in walk_paths(paths, recursive):
+        key = os.path.realpath(file_path)
+        if key not in seen:
+            seen.add(key)
+            yield file_path
 
+
+def walk_paths(paths, recursive):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        if not recursive:
+            print(f"{path}: is a directory (use --recursive)")
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+
+def hash_job(file_path):
+    """Worker entry point: never raise, so one bad file does not abort the pool."""
+    try:
+        return (file_path, *hash_file(file_path), None)
+    except OSError as e:
+        return file_path, 0, {}, 0.0, e
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print size, crc32, md5, sha1 and sha256 of files"
+    )
+    parser.add_argument("paths", nargs="+", help="Files or directories to hash")
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="Descend into directories"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Don't use the persistent hash cache"
+    )
+    args = parser.parse_args()
+
+    files = list(iter_files(args.paths, args.recursive))
+    jobs = args.jobs or os.cpu_count() or 1
+    cache = None if args.no_cache else HashCache()
+    start = time.perf_counter()
+
+    # Resolve cache hits up front so only misses are sent to the workers.
+    keys = {}
+    hits = {}
+    misses = []
+    for file_path in files:
+        try:
+            keys[file_path] = key = file_key(file_path)
+        except OSError:
+            misses.append(file_path)
+            continue
+        digests = cache.lookup(key, ALGORITHMS) if cache else None
+        if digests is None:
+            misses.append(file_path)
+        else:
+            hits[file_path] = digests
+
+    total_size = 0
+    if jobs > 1 and len(misses) > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        # map() yields in submission order, so output is deterministic.
+        results = executor.map(hash_job, misses, chunksize=8)
+    else:
+        executor = None
+        results = map(hash_job, misses)
+
+    try:
+        for file_path in files:
+            if file_path in hits:
+                size = keys[file_path][1]
+                total_size += size
+                print(format_result(file_path, size, hits[file_path], None))
+                continue
+            _, size, digests, elapsed, error = next(results)
+            if error:
+                print(f"{file_path}: {error.strerror or error}")
+                continue
+            if cache and file_path in keys:
+                cache.store(keys[file_path], digests)
+            total_size += size
+            print(format_result(file_path, size, digests, elapsed))
+    finally:
+        if executor:
+            executor.shutdown()
+        if cache:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    if len(files) > 1:
         print(
-            f"{file_path}: size:{human_readable_size(len(rom_data))} crc32:{crc32sum(rom_data)} md5:{md5sum(rom_data)} sha1:{sha1sum(rom_data)} sha256:{sha256sum(rom_data)}"
+            f"Total: {len(files)} files, {human_readable_size(total_size)} "
+            f"in {elapsed:.2f}s ({throughput(total_size, elapsed):.1f} MB/s)"
         )
 
 
@@ -0,0 +1,146 @@
+"""
+Persistent digest cache shared by the hashing scripts.
+
+Digests are stored in SQLite keyed by path and tagged with the size,
+mtime_ns and inode the file had when it was hashed. A lookup only hits if
+all three still match, so modified or replaced files are re-hashed
+automatically. Least recently used rows are pruned once the cache grows
+past max_entries.
+
+The database lives in $HASH_CACHE, or $XDG_CACHE_HOME/py_scripts/hashes.sqlite
+(~/.cache/... by default).
+"""
+import os
+import sqlite3
+import time
+
+MAX_ENTRIES = 2_000_000
+
+
+def default_path() -> str:
+    if os.environ.get("HASH_CACHE"):
+        return os.environ["HASH_CACHE"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "py_scripts", "hashes.sqlite")
+
+
+def file_key(file_path: str, st: os.stat_result | None = None) -> tuple:
+    """Build the (path, size, mtime_ns, inode) key describing a file right now."""
+    if st is None:
+        st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class HashCache:
+    """
+    Maps (path, kind) to a digest, valid only while the file is unchanged.
+
+    kind is a free-form label chosen by the caller, such as "sha1" or
+    "prg:sha1", so different tools can share one database.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = MAX_ENTRIES):
+        self.path = path or default_path()
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "digest TEXT NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (path, kind))"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used)"
+        )
+        self.now = time.time()
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, key: tuple, kinds) -> dict | None:
+        """Return {kind: digest} if every kind is cached for this exact key."""
+        path, size, mtime_ns, inode = key
+        kinds = list(kinds)
+        rows = self.db.execute(
+            "SELECT kind, digest FROM digests WHERE path = ? AND size = ? "
+            "AND mtime_ns = ? AND inode = ?",
+            (path, size, mtime_ns, inode),
+        ).fetchall()
+        found = dict(rows)
+        if any(kind not in found for kind in kinds):
+            return None
+        self.db.execute(
+            "UPDATE digests SET last_used = ? WHERE path = ?", (self.now, path)
+        )
+        self._maybe_commit()
+        return {kind: found[kind] for kind in kinds}
+
+    def store(self, key: tuple, digests: dict) -> None:
+        """Remember digests for key, replacing anything stale for that path."""
+        path, size, mtime_ns, inode = key
+        self.db.execute(
+            "DELETE FROM digests WHERE path = ? AND NOT "
+            "(size = ? AND mtime_ns = ? AND inode = ?)",
+            (path, size, mtime_ns, inode),
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (path, kind, size, mtime_ns, inode, str(digest), self.now)
+                for kind, digest in digests.items()
+            ],
+        )
+        self._maybe_commit()
+
+    def prune(self, max_entries: int | None = None) -> int:
+        """Drop least recently used rows above max_entries. Returns rows removed."""
+        if max_entries is None:
+            max_entries = self.max_entries
+        (count,) = self.db.execute("SELECT COUNT(*) FROM digests").fetchone()
+        excess = count - max_entries
+        if excess <= 0:
+            return 0
+        self.db.execute(
+            "DELETE FROM digests WHERE rowid IN "
+            "(SELECT rowid FROM digests ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.db.commit()
+        return excess
+
+    def close(self) -> None:
+        self.db.commit()
+        self.prune()
+        self.db.close()
+
+    def _maybe_commit(self) -> None:
+        # Batch writes: a commit per file would dominate warm-cache runs.
+        self.pending += 1
+        if self.pending >= 1000:
+            self.db.commit()
+            self.pending = 0
+
+
+def cached_digests(cache: HashCache | None, file_path: str, kinds, compute):
+    """
+    Return {kind: digest} for file_path, calling compute() only on a miss.
+
+    compute must return a dict containing at least every requested kind.
+    With cache=None this is just compute().
+    """
+    if cache is None:
+        return compute()
+    key = file_key(file_path)
+    digests = cache.lookup(key, kinds)
+    if digests is None:
+        digests = compute()
+        cache.store(key, digests)
+    return digests
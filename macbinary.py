@@ -0,0 +1,18 @@
+"""
+MacBinary header detection, shared by the scripts that read or strip it.
+"""
+import struct
+from binascii import crc_hqx
+
+
+def is_macbinary(header: bytes) -> bool:
+    """Sanity-check a 128-byte MacBinary I/II/III header."""
+    if len(header) < 128 or header[0] != 0 or header[74] != 0 or header[82] != 0:
+        return False
+    if not 1 <= header[1] <= 63:
+        return False
+    datalen, rsrclen = struct.unpack(">II", header[0x53:0x5B])
+    if datalen > 0x7FFFFFFF or rsrclen > 0x7FFFFFFF:
+        return False
+    crc = struct.unpack(">H", header[0x7C:0x7E])[0]
+    return crc in (0, crc_hqx(header[:0x7C], 0)) or header[0x66:0x6A] == b"mBIN"
@@ -7,6 +7,8 @@ from pathlib import Path
 
 import macresources
 
+from puny import punyencode
+
 
 def check_pjver(ver: int) -> int:
     if ver >= 0x79F:
@@ -43,27 +45,6 @@ def check_pjver(ver: int) -> int:
         return 200
 
 
-def escape_string(s: str) -> str:
-    new_name = ""
-    for char in s:
-        if char == "\x81":
-            new_name += "\x81\x79"
-        elif char in '/":*|\\?%<>' or ord(char) < 0x20:
-            new_name += f"\x81{chr(0x80 + ord(char))}"
-        else:
-            new_name += char
-    return new_name
-
-
-def needs_punyencoding(orig: str) -> bool:
-    return (
-        not orig.isascii()
-        or orig != escape_string(orig)
-        or orig.endswith(" ")
-        or orig.endswith(".")
-    )
-
-
 parser = argparse.ArgumentParser(description="Process some files.")
 parser.add_argument("file_path", type=Path)
 parser.add_argument("--data-fork", action="store_true")
@@ -120,9 +101,7 @@ with args.file_path.open(mode="rb") as f:
     maxsize = 2 * 1024 * 1024 if args.wage else 5000
     md5hash = hashlib.md5(f.read(min(readsize, maxsize))).hexdigest()
 
-filename = args.file_path.name
-if needs_punyencoding(filename):
-    filename = "xn--" + escape_string(filename).encode("punycode").decode("ascii")
+filename = punyencode(args.file_path.name)
 
 prefix = "d:" if args.data_fork else "r:"
 prefix = "" if args.wage else prefix
@@ -0,0 +1,97 @@
+"""
+Chunk-tree validation for Standard MIDI Files and XMIDI (XMI) files.
+
+Both walkers work over a memoryview of the containing buffer (bytes, an
+mmap, ...) without copying chunk data. They return the exact size of the
+file at an offset, or None as soon as anything is out of place, so
+carving only produces complete files.
+
+    SMF:  MThd <len> format ntracks division
+          MTrk <len> events... FF 2F 00        (ntracks times)
+
+    XMI:  FORM <len> XDIR
+            INFO <len> u16 sequence count
+          CAT  <len> XMID
+            FORM <len> XMID [TIMB] [RBRN] EVNT  (one per sequence)
+
+IFF chunks are padded to an even length; the padding is part of the
+file, except after the last chunk.
+"""
+from struct import unpack_from
+
+END_OF_TRACK = b"\xff\x2f\x00"
+
+
+def iff_chunks(view: memoryview, start: int, end: int):
+    """
+    Yields (tag, data start, data end) for the big-endian IFF chunks in
+    view[start:end], stopping if a chunk doesn't fit.
+    """
+    pos = start
+    while pos + 8 <= end:
+        tag = bytes(view[pos : pos + 4])
+        length = unpack_from(">I", view, pos + 4)[0]
+        data_end = pos + 8 + length
+        if data_end > end:
+            return
+        yield tag, pos + 8, data_end
+        pos = data_end + (length & 1)
+
+
+def smf_extent(buf, offset: int) -> int | None:
+    """Size of the Standard MIDI File at offset, or None if it isn't whole."""
+    with memoryview(buf) as view:
+        end = len(view)
+        if offset + 14 > end or view[offset : offset + 4] != b"MThd":
+            return None
+        header_size, fmt, ntracks = unpack_from(">IHH", view, offset + 4)
+        if header_size < 6 or fmt > 2 or not ntracks:
+            return None
+        pos = offset + 8 + header_size
+        for _ in range(ntracks):
+            if pos + 8 > end or view[pos : pos + 4] != b"MTrk":
+                return None
+            length = unpack_from(">I", view, pos + 4)[0]
+            track_end = pos + 8 + length
+            if length < 3 or track_end > end:
+                return None
+            if view[track_end - 3 : track_end] != END_OF_TRACK:
+                return None
+            pos = track_end
+        return pos - offset
+
+
+def xmi_sequence_ok(view: memoryview, start: int, end: int) -> bool:
+    """True if view[start:end] is a FORM XMID body with an EVNT chunk."""
+    if view[start : start + 4] != b"XMID":
+        return False
+    tags = [tag for tag, _, _ in iff_chunks(view, start + 4, end)]
+    return b"EVNT" in tags
+
+
+def xmi_extent(buf, offset: int) -> int | None:
+    """Size of the XMIDI file at offset, or None if it isn't whole."""
+    with memoryview(buf) as view:
+        end = len(view)
+        chunks = iff_chunks(view, offset, end)
+        form = next(chunks, None)
+        if not form or form[0] != b"FORM" or view[form[1] : form[1] + 4] != b"XDIR":
+            return None
+        info = next(iff_chunks(view, form[1] + 4, form[2]), None)
+        if not info or info[0] != b"INFO" or info[2] - info[1] < 2:
+            return None
+        sequences = unpack_from("<H", view, info[1])[0]
+
+        cat = next(chunks, None)
+        if not cat or cat[0] != b"CAT " or view[cat[1] : cat[1] + 4] != b"XMID":
+            return None
+        forms = [
+            (start, stop)
+            for tag, start, stop in iff_chunks(view, cat[1] + 4, cat[2])
+            if tag == b"FORM"
+        ]
+        if len(forms) < max(sequences, 1):
+            return None
+        if not all(xmi_sequence_ok(view, start, stop) for start, stop in forms):
+            return None
+        return cat[2] - offset
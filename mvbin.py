@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
+"""
+Rename MacBinary files after the Mac name in their header, stripping the
+header from files without a resource fork and setting the mtime.
+
+With -r, a whole tree is normalized: every header is read once, all
+renames are planned and checked for collisions up front (-n prints the
+plan), then files are handled across a thread pool. Files are renamed in
+two phases through temporary names, so files swapping or chaining names
+never overwrite each other, and folders are punyencoded deepest first.
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
 from os import utime
 from os.path import join, split
 from shutil import move
-from sys import argv
 from typing import ByteString
 
+from macbinary import is_macbinary
+from stripbin import strip
+
 # fmt: off
 decode_map = {
     "81": ["　", "、", "。", "，", "．", "・", "：", "；", "？", "！", "゛", "゜", "´", "｀", "¨", "＾", "￣", "＿", "ヽ", "ヾ", "ゝ", "ゞ", "〃", "仝", "々", "〆", "〇", "ー", "—", "‐", "／", "＼", "〜", "‖", "｜", "…", "‥", "‘", "’", "“", "”", "（", "）", "〔", "〕", "［", "］", "｛", "｝", "〈", "〉", "《", "》", "「", "」", "『", "』", "【", "】", "＋", "−", "±", "×", None, "÷", "＝", "≠", "＜", "＞", "≦", "≧", "∞", "∴", "♂", "♀", "°", "′", "″", "℃", "￥", "＄", "¢", "£", "％", "＃", "＆", "＊", "＠", "§", "☆", "★", "○", "●", "◎", "◇", "◆", "□", "■", "△", "▲", "▽", "▼", "※", "〒", "→", "←", "↑", "↓", "〓", None, None, None, None, None, None, None, None, None, None, None, "∈", "∋", "⊆", "⊇", "⊂", "⊃", "∪", "∩", None, None, None, None, None, None, None, None, "∧", "∨", "¬", "⇒", "⇔", "∀", "∃", None, None, None, None, None, None, None, None, None, None, None, "∠", "⊥", "⌒", "∂", "∇", "≡", "≒", "≪", "≫", "√", "∽", "∝", "∵", "∫", "∬", None, None, None, None, None, None, None, "Å", "‰", "♯", "♭", "♪", "†", "‡", "¶", None, None, None, None, "◯"],
@@ -114,53 +129,255 @@ def needs_punyencoding(orig: str) -> bool:
     return False
 
 
-path, fn = split(argv[1])
-japanese = len(argv) > 2 and argv[2]
-
-try:
-    f = open(argv[1], "rb")
-except IsADirectoryError:
-    if needs_punyencoding(argv[1]):
-        of = escape_string(argv[1]).encode("punycode").decode("ascii")
-        of = "xn--" + of
-        print(argv[1], join(path, of))
-        move(argv[1], join(path, of))
-    exit()
-except FileNotFoundError:
-    exit()
-
-f.seek(0x1)
-nlen = int.from_bytes(f.read(1), "big")
-n = f.read(nlen)
-if japanese:
-    n = decode_macjapanese(n).encode("utf-8")
-else:
-    n = n.decode("mac-roman").encode("utf-8")
-
-f.seek(0x53)
-datalen = int.from_bytes(f.read(4), "big")
-f.seek(0x57)
-rsrclen = int.from_bytes(f.read(4), "big")
-f.seek(0x5F)
-mod_time = int.from_bytes(f.read(4), "big") - 2082844800
-if not rsrclen:
-    f.seek(0x41)
-    fn = argv[1].encode("utf-8", "backslashreplace").decode("utf-8")
-    print(f'No rsrc in {fn}, removing MacBin header, {f.read(8).decode("mac-roman")}')
-    f.seek(0x80)
-    data = f.read(datalen)
-    f.close()
-    open(argv[1], "wb").write(data)
-else:
+def target_name(name: str) -> str:
+    """The on-disk name for a Mac file name, punyencoded if needed."""
+    if needs_punyencoding(name):
+        return "xn--" + escape_string(name).encode("punycode").decode("ascii")
+    return name
+
+
+def mac_name(header: bytes, japanese: bool) -> str:
+    n = header[2 : 2 + header[1]]
+    if japanese:
+        return decode_macjapanese(n)
+    return n.decode("mac-roman")
+
+
+def plan_tree(root: str, japanese: bool):
+    """
+    Reads every file's MacBinary header once and plans the tree's changes.
+
+    Returns (file actions, folder renames, problems). A file action is
+    (path, new path, header); new path is None when only the header is
+    stripped and the mtime set. Folder renames are ordered deepest first.
+    Renames that would collide with an existing name, or with another
+    planned rename, are reported as problems and left out. A file may take
+    the name of another file that is renamed away (see rename_files).
+    """
+    actions = []
+    folders = []
+    problems = []
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        planned = []
+        for name in sorted(files):
+            path = join(directory, name)
+            try:
+                with open(path, "rb") as f:
+                    header = f.read(128)
+                if not is_macbinary(header):
+                    continue
+                planned.append((path, target_name(mac_name(header, japanese)), header))
+            except Exception as e:
+                problems.append(f"{path}: {e}")
+        if directory != root:
+            name = split(directory)[1]
+            if needs_punyencoding(name):
+                folders.append((directory, target_name(name)))
+
+        # A name is free if nothing has it, or if its file is renamed away.
+        moving = {split(path)[1] for path, new, _ in planned if new != split(path)[1]}
+        taken = set(files) | set(dirs)
+        claimed = set()
+        for path, new, header in planned:
+            name = split(path)[1]
+            if new == name:
+                actions.append((path, None, header))
+            elif new in claimed or (new in taken and new not in moving):
+                problems.append(f"{path}: {new} already exists, not renamed")
+                actions.append((path, None, header))
+            else:
+                claimed.add(new)
+                actions.append((path, join(directory, new), header))
+
+    folders.sort(key=lambda folder: folder[0].count(os.sep), reverse=True)
+    checked = []
+    for directory, new in folders:
+        new_path = join(split(directory)[0], new)
+        if os.path.lexists(new_path):
+            problems.append(f"{directory}: {new} already exists, not renamed")
+        else:
+            checked.append((directory, new_path))
+    return actions, checked, problems
+
+
+def apply_action(action):
+    """Worker: strips one file (if there's no rsrc) and sets its mtime."""
+    path, _, header = action
+    try:
+        rsrclen = int.from_bytes(header[0x57:0x5B], "big")
+        if not rsrclen:
+            strip(path, header)
+        else:
+            mod_time = int.from_bytes(header[0x5F:0x63], "big") - 2082844800
+            utime(path, (mod_time, mod_time))
+    except (OSError, ValueError) as e:
+        return e
+    return None
+
+
+def temp_path(path: str) -> str:
+    """A free name next to path to park it under while renaming."""
+    directory, name = split(path)
+    n = 0
+    while True:
+        temp = join(directory, f".mvbin-{n}-{name}")
+        if not os.path.lexists(temp):
+            return temp
+        n += 1
+
+
+def rename_files(renames: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Renames (path, new path) pairs: every file is first moved to a
+    temporary name, then to its new name, so a file can take the name of
+    another one in the set. Nothing is renamed onto a path that exists; such
+    files go back to their old name if it's still free. Returns failures
+    as (path, reason).
+    """
+    failures = []
+    parked = []
+    for path, new_path in renames:
+        temp = temp_path(path)
+        try:
+            os.rename(path, temp)
+        except OSError as e:
+            failures.append((path, str(e)))
+            continue
+        parked.append((path, temp, new_path))
+
+    for path, temp, new_path in parked:
+        target = new_path
+        if os.path.lexists(new_path):
+            failures.append((path, f"{new_path} exists, not renamed"))
+            target = path
+            if os.path.lexists(path):
+                failures.append((path, f"{path} is taken too, left as {temp}"))
+                continue
+        try:
+            os.rename(temp, target)
+        except OSError as e:
+            failures.append((path, f"{e}, left as {temp}"))
+    return failures
+
+
+def describe(action) -> str:
+    path, new_path, header = action
+    steps = []
+    if not int.from_bytes(header[0x57:0x5B], "big"):
+        steps.append(f"strip {header[0x41:0x49].decode('mac-roman')}")
+    if new_path:
+        steps.append(f"-> {new_path}")
+    return f"{path}: {' '.join(steps) or 'set mtime'}"
+
+
+def normalize_tree(root: str, japanese: bool, jobs: int, dry_run: bool) -> None:
+    actions, folders, problems = plan_tree(root, japanese)
+    for problem in problems:
+        print(problem)
+    if dry_run:
+        for action in actions:
+            print(describe(action))
+        for directory, new_path in folders:
+            print(f"{directory}: -> {new_path}")
+        return
+
+    failed = 0
+    renames = []
+    with ThreadPoolExecutor(jobs) as executor:
+        for action, error in zip(actions, executor.map(apply_action, actions)):
+            if error:
+                failed += 1
+                print(f"{action[0]}: failed: {error}")
+            else:
+                print(describe(action))
+                if action[1]:
+                    renames.append(action[:2])
+    failures = rename_files(renames)
+    for path, reason in failures:
+        print(f"{path}: failed: {reason}")
+    failed += len({path for path, _ in failures})
+    # Deepest first, after every file inside them is done.
+    renamed = 0
+    for directory, new_path in folders:
+        if os.path.lexists(new_path):
+            print(f"{directory}: failed: {new_path} exists, not renamed")
+            continue
+        print(f"{directory}: -> {new_path}")
+        os.rename(directory, new_path)
+        renamed += 1
+    print(
+        f"{len(actions) - failed} files, {renamed} folders done, "
+        f"{failed} files failed, {len(problems)} problems"
+    )
+
+
+def normalize(path: str, japanese: bool) -> None:
+    """Handles a single file or folder."""
+    parent, fn = split(path)
+    if os.path.isdir(path):
+        if needs_punyencoding(path):
+            of = target_name(path)
+            print(path, join(parent, of))
+            move(path, join(parent, of))
+        return
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    header = f.read(128)
     f.close()
 
-utime(argv[1], (mod_time, mod_time))
+    n = mac_name(header, japanese)
+    if not int.from_bytes(header[0x57:0x5B], "big"):
+        fn_shown = path.encode("utf-8", "backslashreplace").decode("utf-8")
+        type_creator = header[0x41:0x49].decode("mac-roman")
+        print(f"No rsrc in {fn_shown}, removing MacBin header, {type_creator}")
+        strip(path, header)
+    else:
+        mod_time = int.from_bytes(header[0x5F:0x63], "big") - 2082844800
+        utime(path, (mod_time, mod_time))
 
-if needs_punyencoding(n.decode("utf-8")):
-    of = escape_string(n.decode("utf-8")).encode("punycode").decode("ascii")
-    of = "xn--" + of
+    of = target_name(n)
     if of != fn:
-        print(argv[1], join(path, of))
-        move(argv[1], join(path, of))
-elif n != fn:
-    move(argv[1], join(path, n.decode("utf-8")))
+        if of != n:
+            print(path, join(parent, of))
+        move(path, join(parent, of))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Strip and rename MacBinary files after their Mac names"
+    )
+    parser.add_argument("path", help="MacBinary file or folder (a tree with -r)")
+    parser.add_argument(
+        "legacy_japanese", nargs="?", help=argparse.SUPPRESS, metavar="japanese"
+    )
+    parser.add_argument(
+        "--japanese", action="store_true", help="Names are in Mac Japanese"
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="Normalize a whole tree"
+    )
+    parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="With -r, only print the plan"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of files to handle in parallel with -r (0 = one per CPU)",
+    )
+    args = parser.parse_args()
+    japanese = args.japanese or bool(args.legacy_japanese)
+
+    if args.recursive:
+        jobs = args.jobs or os.cpu_count() or 1
+        normalize_tree(args.path, japanese, jobs, args.dry_run)
+    else:
+        normalize(args.path, japanese)
+
+
+if __name__ == "__main__":
+    main()
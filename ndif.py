@@ -0,0 +1,301 @@
+"""
+Disk Copy 4.2 / 6 (NDIF) image decoding.
+
+A Disk Copy 6 image keeps its chunk data in the data fork and a 'bcem'
+resource describing it in the resource fork:
+
+    0x00  u16   version
+    0x02  Str63 volume name
+    0x42  u32   sector count
+    ...
+    0x80  u32   number of chunk entries
+    0x84  entries, 12 bytes each:
+          u24 first sector, u8 type, u32 data fork offset, u32 stored length
+
+Chunk types are 0x00 (zero fill), 0x02 (stored), 0x80 (ADC) and 0xFF
+(end of table); a chunk covers the sectors up to the next entry's first
+sector. Every chunk decodes independently, so chunks can be decoded in
+parallel and written at their own offsets.
+
+DiskImage gives seekable, read-only access to the decoded image, decoding
+only the chunks a read touches and keeping recent ones in an LRU cache.
+
+Images can be given as MacBinary, or as a data fork with a ".rsrc" sidecar.
+Disk Copy 4.2 images (no bcem, 0x54-byte header) are stored uncompressed.
+"""
+import io
+import os
+import struct
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from adc import decompress
+from macbinary import is_macbinary
+
+SECTOR_SIZE = 512
+CHUNK_ZERO = 0x00
+CHUNK_RAW = 0x02
+CHUNK_ADC = 0x80
+CHUNK_END = 0xFF
+DC42_HEADER_SIZE = 0x54
+
+
+class NDIFError(Exception):
+    pass
+
+
+def read_resource(rsrc: bytes, res_type: bytes, res_id: int | None = None) -> bytes:
+    """Returns the first resource of res_type (and res_id, if given)."""
+    data_off, map_off = struct.unpack_from(">II", rsrc, 0)
+    type_list = map_off + struct.unpack_from(">H", rsrc, map_off + 24)[0]
+    type_count = struct.unpack_from(">H", rsrc, type_list)[0] + 1
+    for i in range(type_count):
+        kind, count, ref_off = struct.unpack_from(">4sHH", rsrc, type_list + 2 + i * 8)
+        if kind != res_type:
+            continue
+        for j in range(count + 1):
+            ref = type_list + ref_off + j * 12
+            rid, _, attr_off = struct.unpack_from(">hHI", rsrc, ref)
+            if res_id is not None and rid != res_id:
+                continue
+            start = data_off + (attr_off & 0xFFFFFF)
+            length = struct.unpack_from(">I", rsrc, start)[0]
+            return bytes(rsrc[start + 4 : start + 4 + length])
+    raise KeyError(res_type)
+
+
+def parse_bcem(bcem: bytes) -> tuple[int, list[tuple[int, int, int, int, int]]]:
+    """
+    Decodes a bcem block map.
+
+    Returns (sector count, chunks), where each chunk is
+    (output offset, output size, type, data fork offset, stored length).
+    """
+    if len(bcem) < 0x84:
+        raise NDIFError("bcem resource too short")
+    sector_count = struct.unpack_from(">I", bcem, 0x42)[0]
+    entry_count = struct.unpack_from(">I", bcem, 0x80)[0]
+    entries = [
+        struct.unpack_from(">III", bcem, 0x84 + i * 12)
+        for i in range(min(entry_count, (len(bcem) - 0x84) // 12))
+    ]
+
+    chunks = []
+    for i, (start_type, offset, length) in enumerate(entries):
+        kind = start_type & 0xFF
+        if kind == CHUNK_END:
+            break
+        sector = start_type >> 8
+        if i + 1 < len(entries):
+            end_sector = entries[i + 1][0] >> 8
+        else:
+            end_sector = sector_count
+        size = (end_sector - sector) * SECTOR_SIZE
+        if kind not in (CHUNK_ZERO, CHUNK_RAW, CHUNK_ADC):
+            raise NDIFError(f"unknown chunk type 0x{kind:02x} at sector {sector}")
+        chunks.append((sector * SECTOR_SIZE, size, kind, offset, length))
+    return sector_count, chunks
+
+
+def open_image(path: str) -> tuple[int, bytes | None]:
+    """
+    Locates an image's data fork and resource fork.
+
+    Returns (data fork offset within path, resource fork or None).
+    """
+    with open(path, "rb") as f:
+        header = f.read(128)
+        if is_macbinary(header):
+            datalen, rsrclen = struct.unpack_from(">II", header, 0x53)
+            if rsrclen:
+                f.seek(0x80 + datalen + (-datalen % 0x80))
+                return 0x80, f.read(rsrclen)
+
+    for rsrc_path in (path + ".rsrc", os.path.join(path, "..namedfork", "rsrc")):
+        try:
+            with open(rsrc_path, "rb") as f:
+                rsrc = f.read()
+        except OSError:
+            continue
+        if rsrc:
+            return 0, rsrc
+    return 0, None
+
+
+def image_layout(path: str):
+    """
+    Returns (data fork offset, total size, chunks) for an image.
+
+    Images without a bcem map are treated as Disk Copy 4.2: a single stored
+    chunk after the 0x54-byte header.
+    """
+    base, rsrc = open_image(path)
+    if rsrc:
+        try:
+            sector_count, chunks = parse_bcem(read_resource(rsrc, b"bcem"))
+            return base, sector_count * SECTOR_SIZE, chunks
+        except (KeyError, struct.error):
+            pass
+
+    with open(path, "rb") as f:
+        f.seek(base)
+        header = f.read(DC42_HEADER_SIZE)
+    if len(header) < DC42_HEADER_SIZE or header[0x52:0x54] != b"\x01\x00":
+        raise NDIFError("not a Disk Copy 4.2 or NDIF image")
+    data_size = struct.unpack_from(">I", header, 0x40)[0]
+    return base, data_size, [(0, data_size, CHUNK_RAW, DC42_HEADER_SIZE, data_size)]
+
+
+def decode_chunk(fd: int, base: int, chunk) -> bytes | bytearray:
+    """Reads and decodes one chunk from the image open as fd."""
+    out_offset, size, kind, offset, length = chunk
+    if kind == CHUNK_ZERO:
+        return bytes(size)
+    stored = os.pread(fd, length, base + offset)
+    if kind == CHUNK_RAW:
+        return stored[:size]
+    out = decompress(stored)
+    if len(out) != size:
+        raise NDIFError(
+            f"chunk at 0x{out_offset:x} decoded to {len(out)} bytes, expected {size}"
+        )
+    return out
+
+
+def write_chunks(job) -> int:
+    """
+    Worker: decodes a run of consecutive chunks and writes them with one
+    pwrite() at the run's output offset.
+    """
+    path, out_path, base, chunks = job
+    if all(chunk[2] == CHUNK_ZERO for chunk in chunks):
+        # The output was pre-sized, so zero runs are already there.
+        return 0
+    out = bytearray()
+    with open(path, "rb") as f:
+        for chunk in chunks:
+            out += decode_chunk(f.fileno(), base, chunk)
+    with open(out_path, "r+b") as out_f:
+        return os.pwrite(out_f.fileno(), out, chunks[0][0])
+
+
+def batch_chunks(chunks, batch_size: int = 32 * 1024 * 1024):
+    """Groups consecutive chunks into batches of about batch_size output bytes."""
+    batch = []
+    total = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        total += chunk[1]
+        if total >= batch_size:
+            yield batch
+            batch = []
+            total = 0
+    if batch:
+        yield batch
+
+
+def convert(path: str, out_path: str, jobs: int = 1) -> int:
+    """
+    Writes the decoded disk image of path to out_path.
+
+    Chunks are decoded in batches across jobs worker processes, each writing
+    its output directly at the chunk's offset. Returns the image size.
+    """
+    base, total_size, chunks = image_layout(path)
+    with open(out_path, "wb") as out_f:
+        out_f.truncate(total_size)
+
+    work = [(path, out_path, base, batch) for batch in batch_chunks(chunks)]
+    if jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(write_chunks, work))
+    else:
+        for job in work:
+            write_chunks(job)
+    return total_size
+
+
+class DiskImage(io.RawIOBase):
+    """
+    Read-only, seekable view of the decoded disk inside an NDIF image.
+
+    Reads decode only the chunks they overlap. Decoded chunks are kept in
+    an LRU cache holding at most cache_size bytes.
+    """
+
+    def __init__(self, path: str, cache_size: int = 64 * 1024 * 1024):
+        super().__init__()
+        self.base, self.size, self.chunks = image_layout(path)
+        self.starts = [chunk[0] for chunk in self.chunks]
+        self.file = open(path, "rb")
+        self.pos = 0
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cached_bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.pos = offset
+        return self.pos
+
+    def chunk(self, index: int):
+        """Returns chunk index decoded, from the cache if possible."""
+        data = self.cache.get(index)
+        if data is not None:
+            self.cache.move_to_end(index)
+            return data
+        data = decode_chunk(self.file.fileno(), self.base, self.chunks[index])
+        self.cache[index] = data
+        self.cached_bytes += len(data)
+        while self.cached_bytes > self.cache_size and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= len(evicted)
+        return data
+
+    def readinto(self, buffer) -> int:
+        out = memoryview(buffer).cast("B")
+        done = 0
+        while done < len(out) and self.pos < self.size:
+            index = bisect_right(self.starts, self.pos) - 1
+            if index < 0:
+                break
+            out_offset, size = self.chunks[index][:2]
+            skip = self.pos - out_offset
+            count = min(len(out) - done, size - skip)
+            if count <= 0:
+                # A gap between chunks reads as zeros.
+                end = (
+                    self.starts[index + 1]
+                    if index + 1 < len(self.starts)
+                    else self.size
+                )
+                count = min(len(out) - done, end - self.pos)
+                out[done : done + count] = bytes(count)
+            elif self.chunks[index][2] == CHUNK_ZERO:
+                out[done : done + count] = bytes(count)
+            else:
+                out[done : done + count] = self.chunk(index)[skip : skip + count]
+            done += count
+            self.pos += count
+        return done
+
+    def close(self) -> None:
+        if not self.closed:
+            self.file.close()
+            self.cache.clear()
+        super().close()
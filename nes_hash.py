@@ -1,28 +1,108 @@
 # Parse iNES header and print sha1sum of PRG and CHR ROMs
 
+import argparse
+import csv
 import hashlib
+import json
+import mmap
 import os
 import sys
 import zlib
 
+from hashcache import HashCache, cached_digests
 
-def parse_ines_header(rom_data):
-    if rom_data[0:4] != b"NES\x1a":
+DIGEST_KINDS = [
+    f"{part}:{field}"
+    for part in ("prg", "chr", "rom")
+    for field in ("size", "crc32", "md5", "sha1", "sha256")
+]
+HEADER_FIELDS = [
+    "format",
+    "mapper",
+    "submapper",
+    "mirroring",
+    "battery",
+    "trainer",
+    "console",
+    "timing",
+    "prg_ram",
+    "prg_nvram",
+    "chr_ram",
+    "chr_nvram",
+]
+MIRRORING = ["horizontal", "vertical", "four-screen", "four-screen"]
+CONSOLES = ["nes", "vs", "playchoice10", "extended"]
+TIMINGS = ["ntsc", "pal", "multi", "dendy"]
+
+
+def rom_size(lsb, msb, unit):
+    """Decode an NES 2.0 ROM size, including exponent-multiplier notation."""
+    if msb == 0xF:
+        return (1 << (lsb >> 2)) * ((lsb & 3) * 2 + 1)
+    return ((msb << 8) | lsb) * unit
+
+
+def shift_size(nibble):
+    return 64 << nibble if nibble else 0
+
+
+def parse_header(rom_data):
+    """Decode the 16-byte iNES / NES 2.0 header into a dict."""
+    if len(rom_data) < 16 or rom_data[0:4] != b"NES\x1a":
         raise ValueError("Not a valid iNES file")
 
-    prg_size = rom_data[4] * 16384  # PRG ROM size in bytes
-    chr_size = rom_data[5] * 8192  # CHR ROM size in bytes
+    flags6, flags7 = rom_data[6], rom_data[7]
+    header = {
+        "mirroring": MIRRORING[(flags6 & 1) | ((flags6 >> 2) & 2)],
+        "battery": bool(flags6 & 0x02),
+        "trainer": bool(flags6 & 0x04),
+        "mapper": (flags6 >> 4) | (flags7 & 0xF0),
+        "submapper": 0,
+        "console": CONSOLES[flags7 & 3],
+        "timing": "ntsc",
+        "prg_ram": 0,
+        "prg_nvram": 0,
+        "chr_ram": 0,
+        "chr_nvram": 0,
+    }
+
+    if flags7 & 0x0C == 0x08:
+        header["format"] = "nes2"
+        header["mapper"] |= (rom_data[8] & 0x0F) << 8
+        header["submapper"] = rom_data[8] >> 4
+        header["prg_size"] = rom_size(rom_data[4], rom_data[9] & 0x0F, 16384)
+        header["chr_size"] = rom_size(rom_data[5], rom_data[9] >> 4, 8192)
+        header["prg_ram"] = shift_size(rom_data[10] & 0x0F)
+        header["prg_nvram"] = shift_size(rom_data[10] >> 4)
+        header["chr_ram"] = shift_size(rom_data[11] & 0x0F)
+        header["chr_nvram"] = shift_size(rom_data[11] >> 4)
+        header["timing"] = TIMINGS[rom_data[12] & 3]
+    else:
+        header["format"] = "ines"
+        header["prg_size"] = rom_data[4] * 16384  # PRG ROM size in bytes
+        header["chr_size"] = rom_data[5] * 8192  # CHR ROM size in bytes
+        if rom_data[9] & 1:
+            header["timing"] = "pal"
 
-    has_trainer = rom_data[6] & 0x04
-    trainer_size = 512 if has_trainer else 0
+    return header
 
-    prg_start = 16 + trainer_size
-    prg_end = prg_start + prg_size
+
+def parse_ines_header(rom_data):
+    """
+    Return (prg_rom, chr_rom) as zero-copy memoryview slices of rom_data.
+
+    rom_data may be bytes, a bytearray or an mmap.
+    """
+    header = parse_header(rom_data)
+    view = memoryview(rom_data)
+
+    prg_start = 16 + (512 if header["trainer"] else 0)
+    prg_end = prg_start + header["prg_size"]
     chr_start = prg_end
-    chr_end = chr_start + chr_size
+    chr_end = chr_start + header["chr_size"]
 
-    prg_rom = rom_data[prg_start:prg_end]
-    chr_rom = rom_data[chr_start:chr_end] if chr_size > 0 else b""
+    prg_rom = view[prg_start:prg_end]
+    chr_rom = view[chr_start:chr_end]
 
     return prg_rom, chr_rom
 
@@ -61,38 +141,132 @@ def human_readable_size(size):
     return f"{size:.2f}TB"
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 nes_hash.py <path_to_ines_file>")
-        sys.exit(1)
+def digest_part(digests, part, data):
+    digests[f"{part}:size"] = str(len(data))
+    digests[f"{part}:crc32"] = crc32sum(data)
+    digests[f"{part}:md5"] = md5sum(data)
+    digests[f"{part}:sha1"] = sha1sum(data)
+    digests[f"{part}:sha256"] = sha256sum(data)
 
-    for ines_file_path in sys.argv[1:]:
-        with open(ines_file_path, "rb") as f:
-            rom_data = f.read()
 
-        try:
+def rom_digests(ines_file_path):
+    """Hash PRG, CHR and the headerless ROM into a flat dict suitable for caching."""
+    with open(ines_file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 16:
+            raise ValueError("Not a valid iNES file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as rom_data:
             prg_rom, chr_rom = parse_ines_header(rom_data)
-        except ValueError as e:
-            print(e)
-            sys.exit(1)
-
-        # base_name = os.path.splitext(ines_file_path)[0]
-        # with open(base_name + ".prg", "wb") as f:
-        #     f.write(prg_rom)
-        # if chr_rom:
-        #     with open(base_name + ".chr", "wb") as f:
-        #         f.write(chr_rom)
-
-        print(f"{ines_file_path}:")
-        print(
-            f"PRG size:{human_readable_size(len(prg_rom))} crc32:{crc32sum(prg_rom)} md5:{md5sum(prg_rom)} sha1:{sha1sum(prg_rom)} sha256:{sha256sum(prg_rom)}"
-        )
-        if chr_rom:
-            print(
-                f"CHR size:{human_readable_size(len(chr_rom))} crc32:{crc32sum(chr_rom)} md5:{md5sum(chr_rom)} sha1:{sha1sum(chr_rom)} sha256:{sha256sum(chr_rom)}"
-            )
-        if len(sys.argv) > 2:
-            print()  # Add a blank line between multiple files
+            rom = memoryview(rom_data)[16:]
+            digests = {}
+            try:
+                digest_part(digests, "prg", prg_rom)
+                digest_part(digests, "chr", chr_rom)
+                digest_part(digests, "rom", rom)
+            finally:
+                # The mmap can't close while slices of it are still exported.
+                prg_rom.release()
+                chr_rom.release()
+                rom.release()
+    return digests
+
+
+def read_header(ines_file_path):
+    with open(ines_file_path, "rb") as f:
+        return parse_header(f.read(16))
+
+
+def format_part(label, digests, part):
+    return (
+        f"{label} size:{human_readable_size(int(digests[part + ':size']))}"
+        f" crc32:{digests[part + ':crc32']} md5:{digests[part + ':md5']}"
+        f" sha1:{digests[part + ':sha1']} sha256:{digests[part + ':sha256']}"
+    )
+
+
+def index_row(ines_file_path, cache):
+    """One flat index row: header fields, PRG/CHR sizes and every digest."""
+    header = read_header(ines_file_path)
+    digests = cached_digests(
+        cache, ines_file_path, DIGEST_KINDS, lambda: rom_digests(ines_file_path)
+    )
+    row = {"path": ines_file_path}
+    row.update({field: header[field] for field in HEADER_FIELDS})
+    row.update({kind.replace(":", "_"): value for kind, value in digests.items()})
+    for part in ("prg", "chr", "rom"):
+        row[f"{part}_size"] = int(row[f"{part}_size"])
+    return row
+
+
+def write_index(paths, index_path, cache):
+    """Write one row per ROM to index_path, as JSONL or CSV by its extension."""
+    fieldnames = (
+        ["path"] + HEADER_FIELDS + [kind.replace(":", "_") for kind in DIGEST_KINDS]
+    )
+    as_csv = index_path.lower().endswith(".csv")
+    with open(index_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames) if as_csv else None
+        if writer:
+            writer.writeheader()
+        for ines_file_path in paths:
+            try:
+                row = index_row(ines_file_path, cache)
+            except (ValueError, OSError) as e:
+                print(f"{ines_file_path}: {e}", file=sys.stderr)
+                continue
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def iter_roms(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".nes"):
+                    yield os.path.join(root, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Parse iNES headers and hash PRG and CHR ROMs"
+    )
+    parser.add_argument("paths", nargs="+", help="iNES files or directories")
+    parser.add_argument(
+        "--index",
+        metavar="FILE",
+        help="Write one row per ROM to FILE (.csv for CSV, otherwise JSONL)",
+    )
+    args = parser.parse_args()
+
+    with HashCache() as cache:
+        if args.index:
+            write_index(iter_roms(args.paths), args.index, cache)
+            return
+
+        paths = list(iter_roms(args.paths))
+        for ines_file_path in paths:
+            try:
+                digests = cached_digests(
+                    cache,
+                    ines_file_path,
+                    DIGEST_KINDS,
+                    lambda: rom_digests(ines_file_path),
+                )
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+
+            print(f"{ines_file_path}:")
+            print(format_part("PRG", digests, "prg"))
+            if int(digests["chr:size"]):
+                print(format_part("CHR", digests, "chr"))
+            if len(paths) > 1:
+                print()  # Add a blank line between multiple files
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+"""
+ScummVM-style punycode file names, shared by the detection scripts.
+"""
+
+SPECIAL_SYMBOLS = frozenset('/":*|\\?%<>\x7f')
+
+
+def escape_string(s: str) -> str:
+    """Escape special characters for punycode encoding."""
+    result = []
+    for char in s:
+        if char == "\x81":
+            result.append("\x81\x79")
+        elif char in SPECIAL_SYMBOLS or ord(char) < 0x20:
+            result.append("\x81")
+            result.append(chr(0x80 + ord(char)))
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def needs_punyencoding(s: str) -> bool:
+    """Check if string needs punycode encoding."""
+    if s and s[-1] in " .":
+        return True
+    return any(ord(c) < 0x20 or ord(c) >= 0x80 or c in SPECIAL_SYMBOLS for c in s)
+
+
+def punyencode(s: str) -> str:
+    """Return the name as it appears in ScummVM detection tables."""
+    if needs_punyencoding(s):
+        return "xn--" + escape_string(s).encode("punycode").decode("ascii")
+    return s
@@ -1,17 +1,11 @@
-from struct import unpack
 from sys import argv
 
-search_sig = b"HMIMIDIP013195" + b"\x00" * 18
-f = open(argv[1], "rb").read()
-num = 1
-while True:
-    try:
-        offset = f.index(search_sig)
-    except ValueError:
-        break
-    print(offset)
-    filesize = unpack("<I", f[offset + 0x20 : offset + 0x24])[0]
-    with open(f"{argv[1]}-{num:03}.hmp", "wb") as of:
-        of.write(f[offset : offset + filesize])
-    f = f[offset + 1 :]
-    num += 1
+from carve import carve_file
+
+
+def main():
+    carve_file(argv[1], ["hmp"])
+
+
+if __name__ == "__main__":
+    main()
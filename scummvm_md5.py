@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Generate ScummVM detection entries for every Director file in a disc tree
+
+Windows EXEs, MacBinary files and raw .rsrc resource forks are detected
+by content and hashed in one process (optionally across a worker pool),
+replacing one win_md5.py / mb_md5.py / ad_md5.py run per file.
+"""
+import argparse
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import md5
+
+from macbinary import is_macbinary
+from puny import punyencode
+from win_md5 import check_pjver, compute_hash, extract_version
+
+CHUNK_SIZE = 5000
+
+
+def detect(file_path: str) -> str | None:
+    """Return "win", "macbinary" or "rsrc" for files worth an entry."""
+    with open(file_path, "rb") as f:
+        header = f.read(128)
+    if header[:2] == b"MZ":
+        return "win"
+    if is_macbinary(header):
+        return "macbinary"
+    if file_path.endswith(".rsrc") and len(header) >= 16:
+        return "rsrc"
+    return None
+
+
+def mac_version(rsrc: bytes) -> int:
+    """Director version from a resource fork's vers 1 or MMTE 0 resource."""
+    import macresources  # type: ignore
+
+    resources = list(macresources.parse_file(rsrc))
+    vers = [r for r in resources if r.type == b"vers" and r.id == 1]
+    old_vers = [r for r in resources if r.type == b"MMTE" and r.id == 0]
+    if old_vers:
+        ver = bytes(old_vers[0][1:]).decode("macroman").split()[0]
+        match = re.search(r"^[\d\.]+", ver)
+        return int(float(match.group(0)) * 100) if match else 0
+    if vers:
+        digits = [(byte >> 4) * 10 + (byte & 0x0F) for byte in bytes(vers[0])[:2]]
+        return digits[0] * 100 + digits[1]
+    return 0
+
+
+def win_entry(f, head: bool, version: bool) -> tuple[str, int, int | None]:
+    pjver = check_pjver(extract_version(f)) if version else None
+    digest = ("h:" if head else "t:") + compute_hash(f, head, CHUNK_SIZE)
+    return digest, f.seek(0, 2), pjver
+
+
+def data_entry(f, length: int, version: bool) -> tuple[str, int, int | None]:
+    """Hashes and sizes the data fork of a MacBinary file with no resource fork."""
+    f.seek(0x80)
+    digest = "d:" + md5(f.read(min(length, CHUNK_SIZE))).hexdigest()
+    return digest, length, 0 if version else None
+
+
+def rsrc_entry(f, offset: int, length: int, version: bool):
+    """Hashes and sizes the data section of the resource fork at offset."""
+    f.seek(offset)
+    header = f.read(0xC)
+    if len(header) < 0xC:
+        raise ValueError("resource fork too short")
+    data_offset, data_length = struct.unpack(">I4xI", header)
+    if data_offset + data_length > length:
+        raise ValueError("resource data runs past the end of the fork")
+    f.seek(offset + data_offset)
+    digest = "r:" + md5(f.read(min(data_length, CHUNK_SIZE))).hexdigest()
+    pjver = None
+    if version:
+        f.seek(offset)
+        pjver = mac_version(f.read(length))
+    return digest, data_length, pjver
+
+
+def entry(job: tuple[str, bool, bool]) -> str | None:
+    """Worker: one detection line for a file, or None if it isn't relevant."""
+    file_path, head, version = job
+    try:
+        kind = detect(file_path)
+        if kind is None:
+            return None
+        with open(file_path, "rb") as f:
+            if kind == "win":
+                digest, size, pjver = win_entry(f, head, version)
+            elif kind == "macbinary":
+                header = f.read(128)
+                name = header[2 : 2 + header[1]].decode("mac-roman")
+                datalen, rsrclen = struct.unpack(">II", header[0x53:0x5B])
+                if rsrclen:
+                    rsrcoff = 0x80 + datalen + (-datalen % 0x80)
+                    digest, size, pjver = rsrc_entry(f, rsrcoff, rsrclen, version)
+                else:
+                    digest, size, pjver = data_entry(f, datalen, version)
+            else:
+                digest, size, pjver = rsrc_entry(
+                    f, 0, os.fstat(f.fileno()).st_size, version
+                )
+    except Exception as e:  # pylint: disable=broad-except
+        return f"// {file_path}: {e}"
+
+    if kind == "win":
+        name = os.path.basename(file_path)
+    elif kind == "rsrc":
+        name = os.path.basename(file_path)[: -len(".rsrc")]
+    fields = [f'"{punyencode(name)}"', f'"{digest}"', str(size)]
+    if pjver is not None:
+        fields.append(str(pjver))
+    return ", ".join(fields)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Print ScummVM detection entries for a directory tree"
+    )
+    parser.add_argument("paths", nargs="+", help="Files or directories")
+    parser.add_argument(
+        "--head", action="store_true", help="Hash the head instead of the tail of EXEs"
+    )
+    parser.add_argument(
+        "--version", action="store_true", help="Append the Director version"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of worker processes (0 = one per CPU)",
+    )
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+
+    jobs = [(file_path, args.head, args.version) for file_path in files]
+    workers = args.jobs or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            lines = list(executor.map(entry, jobs, chunksize=16))
+    else:
+        lines = [entry(job) for job in jobs]
+
+    for line in lines:
+        if line:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
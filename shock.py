@@ -2,10 +2,17 @@
 """
 Extracts Director movies from a Projector
 """
+import argparse
+import fnmatch
+import json
+import mmap
 import os
 import re
 import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from struct import error as struct_error
 from struct import pack, unpack
 from typing import Literal
 from zlib import decompress
@@ -17,12 +24,9 @@ INT_MMAP_POS = 0x18
 MMAP_POS = 0x2C
 
 
-class EndianReader(BytesIO):
+class EndianMixin:
     """
-    Endian-aware functions for reading data
-
-    Args:
-        BytesIO (file): Input file
+    Endian-aware functions for reading data, on top of read() and write()
     """
 
     endian: ENDIAN = ""
@@ -59,6 +63,60 @@ class EndianReader(BytesIO):
         self.write(packed_data)
 
 
+class EndianReader(EndianMixin, BytesIO):
+    """
+    Endian-aware functions for reading data
+
+    Args:
+        BytesIO (file): Input file
+    """
+
+
+class ViewReader(EndianMixin):
+    """
+    Read-only, endian-aware reader over a memoryview (e.g. of an mmap)
+
+    Small reads return bytes; view() hands out zero-copy slices so large
+    chunks can be passed on without being copied.
+
+    Args:
+        data (memoryview): Buffer to read from
+    """
+
+    def __init__(self, data: memoryview, endian: ENDIAN = "") -> None:
+        self.data = data
+        self.pos = 0
+        self.endian = endian
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Moves the read position, like io.IOBase.seek."""
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += len(self.data)
+        self.pos = max(offset, 0)
+        return self.pos
+
+    def tell(self) -> int:
+        """Returns the read position."""
+        return self.pos
+
+    def view(self, size: int = -1) -> memoryview:
+        """Returns the next size bytes as a memoryview, without copying."""
+        end = len(self.data) if size < 0 else min(self.pos + size, len(self.data))
+        chunk = self.data[self.pos : end]
+        self.pos = max(end, self.pos)
+        return chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads and returns the next size bytes."""
+        return bytes(self.view(size))
+
+    def sub(self, offset: int, size: int) -> "ViewReader":
+        """Returns a reader over [offset, offset + size) sharing this buffer."""
+        return ViewReader(self.data[offset : offset + size], self.endian)
+
+
 def parse_dict(dict_data: bytes, endianness: ENDIAN = "<") -> list[str]:
     """Parses the dictionary section of the file and extracts file names."""
     byte_stream = EndianReader(dict_data[8:])
@@ -94,31 +152,192 @@ def parse_dict(dict_data: bytes, endianness: ENDIAN = "<") -> list[str]:
     return filenames
 
 
-def main() -> None:
+def relocate_table(table: memoryview, stride: int, relative: int, endian: ENDIAN):
     """
-    Main function
+    Subtracts relative from the first 32-bit field of every non-zero entry
+    in a memory map table, in one pass. Returns the rewritten table bytes.
     """
-    if len(sys.argv) < 2:
-        print("Usage: shock.py <input_file>")
-        sys.exit(1)
+    if stride % 4 or array("I").itemsize != 4:
+        out = bytearray(table)
+        fmt = f"{endian}I"
+        for pos in range(0, len(out), stride):
+            absolute = unpack(fmt, out[pos : pos + 4])[0]
+            if absolute:
+                out[pos : pos + 4] = pack(fmt, (absolute - relative) & 0xFFFFFFFF)
+        return out
+
+    words = array("I")
+    words.frombytes(table)
+    swap = (endian == "<") != (sys.byteorder == "little")
+    if swap:
+        words.byteswap()
+    step = stride // 4
+    words[::step] = array(
+        "I", [(v - relative) & 0xFFFFFFFF if v else 0 for v in words[::step]]
+    )
+    if swap:
+        words.byteswap()
+    return words
+
+
+def write_spliced(f, data: memoryview, patches: list[tuple[int, bytes]]) -> None:
+    """
+    Writes data to f with each (offset, replacement) patch spliced in.
 
-    input_file_path = sys.argv[1]
-    with open(input_file_path, "rb") as input_file:
-        data = input_file.read()
+    Patches must not overlap; everything between them is written straight
+    from data without being copied.
+    """
+    pos = 0
+    for offset, replacement in sorted(patches, key=lambda p: p[0]):
+        f.write(data[pos:offset])
+        f.write(replacement)
+        pos = offset + len(replacement)
+    f.write(data[pos:])
 
-    win_file = re.search(rb"XFIR.{4}LPPA", data, re.S)
-    mac_file = re.search(rb"RIFX.{4}APPL", data, re.S)
 
-    if win_file:
-        offset = win_file.start()
-    elif mac_file:
-        offset = mac_file.start()
+def write_movie(movie: ViewReader, out_path: str) -> None:
+    """
+    Writes a movie with its memory map pointers made relative to the movie.
+
+    The mmap table is relocated in one vectorised pass and spliced, with
+    the other patched words, into a stream written from the source view.
+    """
+    movie.seek(0x36)
+    mmap_res_len = movie.read_i16()
+    movie.seek(0x3C)
+    mmap_res = movie.read_i32() - 1
+    movie.seek(0x54)
+    relative = movie.read_i32()
+
+    size = len(movie.data)
+    table_start = 0x68
+    table_end = table_start
+    if mmap_res > 0 and mmap_res_len:
+        count = min(mmap_res, (size - table_start) // mmap_res_len)
+        table_end = table_start + max(count, 0) * mmap_res_len
+    table = relocate_table(
+        movie.data[table_start:table_end], mmap_res_len, relative, movie.endian
+    )
+    # The trailing word is zeroed; it wins if the table runs into it.
+    table = memoryview(table).cast("B")[: max(size - 4 - table_start, 0)]
+
+    patches = [
+        (INT_MMAP_POS, pack(f"{movie.endian}I", MMAP_POS)),
+        (table_start, table),
+        (size - 4, b"\x00\x00\x00\x00"),
+    ]
+    with open(out_path, "wb") as f:
+        write_spliced(f, movie.data, patches)
+
+
+def output_file_name(name: str, file_type: str, path_sep: str) -> str:
+    """Derives the output file name for a Dict entry from its original path."""
+    pattern = rf"([^{re.escape(path_sep)}]+)$"
+    match = re.search(pattern, name)
+    output_name = match.group(1) if match else name
+
+    extension_mapping = {".dir": [".dxr", ".dcr"], ".cst": [".cxt", ".cct"]}
+    extensions = [i for k, v in extension_mapping.items() for i in [k] + v]
+    if not output_name[-4:].lower() in extensions or output_name[-4] != ".":
+        output_name_ext = ".dir"
     else:
-        print("Not a Director application")
-        sys.exit(1)
+        output_name_ext = output_name[-4:].lower()
+
+    if output_name_ext in extension_mapping:
+        if file_type == "MV93":
+            output_name_ext = extension_mapping[output_name_ext][0]
+        elif file_type == "FGDM":
+            output_name_ext = extension_mapping[output_name_ext][1]
+        if output_name[-4:].isupper():
+            output_name_ext = output_name_ext.upper()
+
+    if len(output_name) < 4:
+        output_name = output_name + output_name_ext
+    else:
+        output_name = output_name[:-4] + output_name_ext
+    return output_name.replace("/", "_")
+
+
+def write_xtra(temp_file: ViewReader, out_path: str) -> list[str]:
+    """Decompresses an Xtra's FILE payload. Returns any Xinf dumps."""
+    messages = []
+    temp_file.seek(12)
+    pos = temp_file.tell()
+    if temp_file.read(1) != b"\x00":
+        temp_file.seek(pos)
+    tag = ""
+    size = 0
+    while tag not in ["XTdf", "FILE"]:
+        if tag == "Xinf":
+            # TODO: Figure out what this is
+            messages.append(temp_file.read(size).hex())
+            size = 0
+        temp_file.seek(size, 1)
+        tag = temp_file.read_tag()
+        size = temp_file.read_i32()
+        size += -size % 2
+        if tag == "FILE":
+            temp_file.seek(0x1C, 1)
+    if size:
+        decompressed_data = decompress(temp_file.view(size))
+        with open(out_path, "wb") as f:
+            f.write(decompressed_data)
+    return messages
+
+
+def write_entry(job: tuple[str, ViewReader, str]) -> list[str]:
+    """Worker: writes one embedded file. Returns messages to print."""
+    file_type, temp_file, out_path = job
+    if file_type in ["FGDM", "FGDC"]:
+        with open(out_path, "wb") as f:
+            f.write(temp_file.data)
+        return []
+    if file_type == "Xtra":
+        return write_xtra(temp_file, out_path)
+    write_movie(temp_file, out_path)
+    return []
+
+
+def find_projector(data: mmap.mmap, chunk_size: int = 1 << 20) -> tuple[int, bool]:
+    """
+    Finds the embedded movie in one chunked pass over the file.
 
-    print(f"SW file found at 0x{offset:x}")
-    file_stream = EndianReader(data[offset:])
+    Like the old whole-file regex search, a Windows (XFIR....LPPA) match
+    anywhere wins over a Mac (RIFX....APPL) one: the scan stops at the first
+    Windows match and otherwise returns the first Mac match once the whole
+    file has been seen. Returns (offset, is_win) or (-1, False).
+    """
+    size = len(data)
+    pos = 0
+    mac_hit = -1
+    while pos < size:
+        end = min(pos + chunk_size + 11, size)
+        for signature, kind, is_win in (
+            (b"XFIR", b"LPPA", True),
+            (b"RIFX", b"APPL", False),
+        ):
+            if not is_win and mac_hit >= 0:
+                continue
+            start = pos
+            while (hit := data.find(signature, start, end)) >= 0:
+                if data[hit + 8 : hit + 12] == kind:
+                    if is_win:
+                        return hit, True
+                    mac_hit = hit
+                    break
+                start = hit + 1
+        pos += chunk_size
+    return mac_hit, False
+
+
+def read_file_table(data: memoryview, offset: int) -> tuple[ViewReader, list]:
+    """
+    Reads the projector's embedded file table at offset.
+
+    Returns a reader over the movie and a list of (name, offset, size, type),
+    with offsets relative to the reader.
+    """
+    file_stream = ViewReader(data[offset:])
     endian = file_stream.read_ident()
 
     file_stream.seek(IMAP_POS)
@@ -155,113 +374,257 @@ def main() -> None:
             file_stream.seek(chunk_offset)
             names = parse_dict(file_stream.read(size), endian)
 
-    file_table = zip(names, files)
+    table = []
+    for name, (file_offset, _) in zip(names, files):
+        file_stream.seek(file_offset + 4)
+        size = file_stream.read_i32() + 8
+        temp_file = file_stream.sub(file_offset, size)
+        temp_file.read_ident()
+        temp_file.seek(8)
+        table.append((name, file_offset, size, temp_file.read_tag()))
+    return file_stream, table
+
+
+def output_folder(input_file_path: str) -> str:
+    """Creates and returns the folder a projector is extracted into."""
     out_folder, _ = os.path.splitext(input_file_path)
     if out_folder == input_file_path:
         out_folder += "_out"
-
     os.makedirs(out_folder, exist_ok=True)
+    return out_folder
 
-    for name, file in file_table:
-        path_sep = "\\" if win_file else ":"
-        pattern = rf"([^{re.escape(path_sep)}]+)$"
-        match = re.search(pattern, name)
-        output_name = match.group(1) if match else name
 
-        offset, _ = file
-        print(f"Original file path: {os.path.join(name)} @ 0x{offset:x}")
+def extract_table(
+    file_stream: ViewReader, table: list, out_folder: str, path_sep: str, jobs: int
+) -> None:
+    """
+    Writes the (name, offset, size, type) entries of table into out_folder
 
-        file_stream.seek(offset + 4)
-        size = file_stream.read_i32() + 8
-        file_stream.seek(offset)
-        temp_file = EndianReader(file_stream.read(size))
-        temp_file.read_ident()
-        temp_file.seek(8)
-        file_type = temp_file.read_tag()
+    Output names, including the _N suffixes for colliding names, are all
+    decided up front in table order, so writing them from a pool of jobs
+    threads gives the same result as writing them one by one and no two
+    entries share a path. Movies also avoid files already in out_folder;
+    FGDM/FGDC/Xtra outputs overwrite those, as they always have.
+    """
+    existing = set(os.listdir(out_folder))
+    claimed = set()
 
-        extension_mapping = {".dir": [".dxr", ".dcr"], ".cst": [".cxt", ".cct"]}
-        extensions = [i for k, v in extension_mapping.items() for i in [k] + v]
-        if not output_name[-4:].lower() in extensions or output_name[-4] != ".":
-            output_name_ext = ".dir"
-        else:
-            output_name_ext = output_name[-4:].lower()
-
-        if output_name_ext in extension_mapping:
-            if file_type == "MV93":
-                output_name_ext = extension_mapping[output_name_ext][0]
-            elif file_type == "FGDM":
-                output_name_ext = extension_mapping[output_name_ext][1]
-            if output_name[-4:].isupper():
-                output_name_ext = output_name_ext.upper()
-
-        if len(output_name) < 4:
-            output_name = output_name + output_name_ext
-        else:
-            output_name = output_name[:-4] + output_name_ext
-        output_name = output_name.replace("/", "_")
-
-        if file_type in ["FGDM", "FGDC"]:
-            temp_file.seek(0)
-            with open(os.path.join(out_folder, output_name), "wb") as f:
-                f.write(temp_file.read())
-            continue
-
-        if file_type == "Xtra":
-            pos = temp_file.tell()
-            if temp_file.read(1) != b"\x00":
-                temp_file.seek(pos)
-            tag = ""
-            size = 0
-            while tag not in ["XTdf", "FILE"]:
-                if tag == "Xinf":
-                    # TODO: Figure out what this is
-                    print(temp_file.read(size).hex())
-                    size = 0
-                temp_file.read(size)
-                tag = temp_file.read_tag()
-                size = temp_file.read_i32()
-                size += -size % 2
-                if tag == "FILE":
-                    temp_file.read(0x1C)
-            if size:
-                decompressed_data = decompress(temp_file.read(size))
-                with open(os.path.join(out_folder, output_name), "wb") as f:
-                    f.write(decompressed_data)
-            else:
-                temp_file.read(size)
-            continue
-
-        temp_file.seek(0x36)
-        mmap_res_len = temp_file.read_i16()
-        temp_file.seek(0x3C)
-        mmap_res = temp_file.read_i32() - 1
-        temp_file.seek(0x54)
-        relative = temp_file.read_i32()
-        temp_file.seek(INT_MMAP_POS)
-        temp_file.write_i32(MMAP_POS)
-
-        for i in range(mmap_res):
-            pos = 0x68 + (i * mmap_res_len)
-            temp_file.seek(pos)
-            absolute = temp_file.read_i32()
-            if absolute:
-                absolute -= relative
-                temp_file.seek(pos)
-                temp_file.write_i32(absolute)
+    work = []
+    for name, file_offset, size, file_type in table:
+        print(f"Original file path: {os.path.join(name)} @ 0x{file_offset:x}")
 
-        temp_file.seek(-4, 2)
-        if temp_file.read(4) != b"\x00\x00\x00\x00":
-            temp_file.seek(-4, 2)
-            temp_file.write_i32(0)
+        temp_file = file_stream.sub(file_offset, size)
+        temp_file.read_ident()
 
-        temp_file.seek(0)
+        output_name = output_file_name(name, file_type, path_sep)
+        movie = file_type not in ["FGDM", "FGDC", "Xtra"]
         output_name_orig = output_name
         i = 0
-        while os.path.exists(os.path.join(out_folder, output_name)):
+        while output_name in claimed or (movie and output_name in existing):
             i += 1
             output_name = f"{output_name_orig}_{i}"
-        with open(os.path.join(out_folder, output_name), "wb") as f:
-            f.write(temp_file.read())
+        claimed.add(output_name)
+        work.append((file_type, temp_file, os.path.join(out_folder, output_name)))
+
+    if jobs > 1 and len(work) > 1:
+        # zlib and file writes release the GIL, and threads share the mapping.
+        with ThreadPoolExecutor(jobs) as executor:
+            results = list(executor.map(write_entry, work))
+    else:
+        results = [write_entry(job) for job in work]
+
+    for messages in results:
+        for message in messages:
+            print(message)
+
+
+def extract(
+    data: mmap.mmap, input_file_path: str, jobs: int = 1, only: str | None = None
+) -> None:
+    """
+    Extracts every file (or those whose names match only) from a projector
+    """
+    offset, win_file = find_projector(data)
+    if offset < 0:
+        print("Not a Director application")
+        sys.exit(1)
+
+    print(f"SW file found at 0x{offset:x}")
+    file_stream, table = read_file_table(memoryview(data), offset)
+    if only:
+        table = [entry for entry in table if fnmatch.fnmatch(entry[0], only)]
+    path_sep = "\\" if win_file else ":"
+    extract_table(file_stream, table, output_folder(input_file_path), path_sep, jobs)
+
+
+def extract_indexed(
+    data: mmap.mmap | None,
+    input_file_path: str,
+    entry: dict,
+    only: str | None,
+    jobs: int,
+) -> None:
+    """Extracts a projector's files at the offsets recorded in its catalog entry."""
+    end = max((f["offset"] + f["size"] for f in entry["files"]), default=0)
+    if not data or len(data) < end:
+        print(f"{input_file_path}: empty or shorter than catalogued, skipped")
+        return
+    file_stream = ViewReader(memoryview(data)[entry["offset"] :])
+    file_stream.read_ident()
+    table = [
+        (f["name"], f["offset"] - entry["offset"], f["size"], f["type"])
+        for f in entry["files"]
+        if not only or fnmatch.fnmatch(f["name"], only)
+    ]
+    if not table:
+        return
+    print(f"{input_file_path}:")
+    path_sep = "\\" if entry["platform"] == "win" else ":"
+    extract_table(file_stream, table, output_folder(input_file_path), path_sep, jobs)
+
+
+def scan_projector(data: mmap.mmap) -> dict | None:
+    """Describes a mapped projector's embedded files, or None if it isn't one."""
+    offset, win_file = find_projector(data)
+    if offset < 0:
+        return None
+    try:
+        _, table = read_file_table(memoryview(data), offset)
+    except (AssertionError, UnicodeDecodeError, struct_error):
+        return None
+    return {
+        "offset": offset,
+        "platform": "win" if win_file else "mac",
+        "files": [
+            {"name": name, "offset": offset + file_offset, "size": size, "type": kind}
+            for name, file_offset, size, kind in table
+        ],
+    }
+
+
+def map_file(input_file_path: str) -> mmap.mmap | None:
+    """Maps a file read-only, or returns None for empty files."""
+    with open(input_file_path, "rb") as input_file:
+        if not os.fstat(input_file.fileno()).st_size:
+            return None
+        return mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_catalog(paths: list[str], catalog_path: str) -> None:
+    """
+    Writes a JSON catalog of every projector found under paths
+
+    Only the signature scan, the file table and each file's type tag are
+    read, so later --list/--index runs never need to touch the projectors.
+    """
+    catalog = {}
+    for path in paths:
+        if os.path.isdir(path):
+            found = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+            )
+        else:
+            found = [path]
+        for input_file_path in found:
+            data = map_file(input_file_path)
+            if not data:
+                continue
+            entry = scan_projector(data)
+            data.close()
+            if entry:
+                print(f"{input_file_path}: {len(entry['files'])} files")
+                catalog[input_file_path] = entry
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=1, ensure_ascii=False)
+
+
+def list_catalog(catalog: dict, only: str | None = None) -> None:
+    """Prints the embedded files recorded in a catalog."""
+    for input_file_path, entry in catalog.items():
+        for file in entry["files"]:
+            if only and not fnmatch.fnmatch(file["name"], only):
+                continue
+            print(
+                f"{input_file_path}\t{file['type']}\t0x{file['offset']:x}"
+                f"\t{file['size']}\t{file['name']}"
+            )
+
+
+def main() -> None:
+    """
+    Main function
+    """
+    parser = argparse.ArgumentParser(
+        description="Extract Director movies from a Projector"
+    )
+    parser.add_argument("inputs", nargs="*", help="Projectors (or directories)")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of files to write in parallel (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--catalog",
+        metavar="JSON",
+        help="Write a catalog of the embedded files of every input projector",
+    )
+    parser.add_argument(
+        "--index",
+        metavar="JSON",
+        help="Work from a catalog written by --catalog instead of scanning",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List embedded files instead of extracting"
+    )
+    parser.add_argument(
+        "--only", metavar="GLOB", help="Only handle files whose path matches GLOB"
+    )
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+
+    if args.catalog:
+        write_catalog(args.inputs, args.catalog)
+        return
+
+    if args.index:
+        with open(args.index, encoding="utf-8") as f:
+            catalog = json.load(f)
+        if args.inputs:
+            catalog = {k: v for k, v in catalog.items() if k in args.inputs}
+        if args.list:
+            list_catalog(catalog, args.only)
+            return
+        for input_file_path, entry in catalog.items():
+            try:
+                data = map_file(input_file_path)
+            except OSError as e:
+                print(f"{input_file_path}: {e.strerror}, skipped")
+                continue
+            extract_indexed(data, input_file_path, entry, args.only, jobs)
+            if data:
+                data.close()
+        return
+
+    if len(args.inputs) != 1:
+        parser.error("expected one projector, or --catalog/--index")
+
+    input_file_path = args.inputs[0]
+    data = map_file(input_file_path)
+    if not data:
+        print("Not a Director application")
+        sys.exit(1)
+
+    if args.list:
+        entry = scan_projector(data)
+        if entry:
+            list_catalog({input_file_path: entry}, args.only)
+    else:
+        extract(data, input_file_path, jobs, args.only)
+    data.close()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,25 @@
+import os
 import re
 from hashlib import sha1
 
-table = [i.split("\t") for i in open("l").read().splitlines()]
-for file, hash, size in table:
-    size_int = int(size)
-    hash = hash.replace("***", ".{20}")
+from hashcache import HashCache, cached_digests
+
+
+def sha1_file(file):
+    h = sha1()
     with open(file, "rb") as f:
-        sha = sha1(f.read()).hexdigest()
-        fsize = f.tell()
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return {"sha1": h.hexdigest()}
+
+
+table = [i.split("\t") for i in open("l").read().splitlines()]
+with HashCache() as cache:
+    for file, hash, size in table:
+        size_int = int(size)
+        hash = hash.replace("***", ".{20}")
+        sha = cached_digests(cache, file, ["sha1"], lambda: sha1_file(file))["sha1"]
+        fsize = os.path.getsize(file)
         if fsize != size_int:
             print(f"{file}: Size mismatch ({fsize} != expected {size_int})")
             continue
@@ -1,16 +1,141 @@
 #!/usr/bin/python3
-from os import utime
-from sys import argv
-
-f = open(argv[1], "rb")
-f.seek(0x5F)
-mod_time = int.from_bytes(f.read(4), "big") - 2082844800
-f.seek(0x41)
-print(f'{argv[1]}: removing MacBin header, {f.read(8).decode("mac-roman")}')
-f.seek(0x53)
-datalen = int.from_bytes(f.read(4), "big")
-f.seek(0x80)
-data = f.read(datalen)
-f.close()
-open(argv[1], "wb").write(data)
-utime(argv[1], (mod_time, mod_time))
+"""
+Strip the MacBinary header from files, keeping only the data fork
+
+The data fork is copied with fastcopy.copy_exact into a temporary file
+next to the original, which then atomically replaces it: memory use
+doesn't depend on file size, and an interrupted run leaves the original
+untouched.
+
+With -r, every MacBinary file under the given directories is stripped
+across a thread pool. Files with a resource fork are left alone there
+unless --drop-rsrc is given.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastcopy import copy_exact
+from macbinary import is_macbinary
+
+
+def read_header(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(128)
+
+
+def strip(path: str, header: bytes | None = None) -> int:
+    """
+    Replaces the MacBinary file at path with its data fork.
+
+    The file keeps its permissions and gets the Mac modification date as
+    mtime. Returns the data fork length.
+    """
+    if header is None:
+        header = read_header(path)
+    datalen = int.from_bytes(header[0x53:0x57], "big")
+    mod_time = int.from_bytes(header[0x5F:0x63], "big") - 2082844800
+
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory or ".")
+    try:
+        with open(path, "rb") as f:
+            copy_exact(f.fileno(), fd, 0x80, datalen)
+            os.chmod(tmp_path, os.fstat(f.fileno()).st_mode & 0o7777)
+        os.fsync(fd)
+        os.close(fd)
+        fd = -1
+        os.utime(tmp_path, (mod_time, mod_time))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if fd >= 0:
+            os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    return datalen
+
+
+def strip_job(job: tuple[str, bool]):
+    """Worker: strips one file if it is MacBinary, returning (path, info, error)."""
+    path, drop_rsrc = job
+    try:
+        header = read_header(path)
+        if not is_macbinary(header):
+            return path, None, None
+        rsrclen = int.from_bytes(header[0x57:0x5B], "big")
+        if rsrclen and not drop_rsrc:
+            return path, None, None
+        datalen = strip(path, header)
+    except (EOFError, OSError, ValueError) as e:
+        return path, None, e
+    return path, (header[0x41:0x49].decode("mac-roman"), datalen, rsrclen), None
+
+
+def strip_tree(roots: list[str], drop_rsrc: bool, jobs: int) -> None:
+    """Strips every MacBinary file under roots, across a thread pool."""
+    work = [
+        (os.path.join(directory, name), drop_rsrc)
+        for root in roots
+        for directory, _, names in os.walk(root)
+        for name in sorted(names)
+    ]
+    start = time.perf_counter()
+    counts = {"stripped": 0, "skipped": 0, "failed": 0}
+    with ThreadPoolExecutor(jobs) as executor:
+        for path, info, error in executor.map(strip_job, work):
+            if error:
+                counts["failed"] += 1
+                print(f"{path}: failed: {error}")
+            elif info is None:
+                counts["skipped"] += 1
+            else:
+                counts["stripped"] += 1
+                type_creator, datalen, rsrclen = info
+                dropped = f", dropped {rsrclen} byte rsrc" if rsrclen else ""
+                print(f"{path}: removed MacBin header, {type_creator}{dropped}")
+    print(
+        f"{counts['stripped']} stripped, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed in {time.perf_counter() - start:.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strip MacBinary headers in place")
+    parser.add_argument(
+        "paths", nargs="+", help="MacBinary files, or directories with -r"
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Strip every MacBinary file under the given directories",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of files to strip in parallel with -r (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--drop-rsrc",
+        action="store_true",
+        help="With -r, also strip files that have a resource fork",
+    )
+    args = parser.parse_args()
+
+    if args.recursive:
+        strip_tree(args.paths, args.drop_rsrc, args.jobs or os.cpu_count() or 1)
+        return
+
+    for path in args.paths:
+        header = read_header(path)
+        type_creator = header[0x41:0x49].decode("mac-roman")
+        print(f"{path}: removing MacBin header, {type_creator}")
+        strip(path, header)
+
+
+if __name__ == "__main__":
+    main()
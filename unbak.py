@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 # See https://www.downtowndougbrown.com/2013/06/legacy-apple-backup-file-format-on-floppy-disks/
+import argparse
+import fnmatch
+import json
 import os
 import struct
-import sys
 from binascii import crc_hqx
 from pathlib import Path
-from typing import Tuple
+from typing import NamedTuple
+
+from fastcopy import copy_exact
+
+DISK_HEADER = ">2x4sHHII32pII454x"
+RECORD_HEADER = ">2x4sHII32pHBB4s4sH24xIIIIIIH"
 
 
 def file_to_macbin(datalen, rsrclen, crdate, mddate, type, creator, flags, name):
@@ -76,49 +83,98 @@ def needs_punyencoding(orig: str) -> bool:
     return False
 
 
-f = open(sys.argv[1], "rb")
-
-magic, disk_n, n_disks, _, _, volume_name, _, size = struct.unpack(
-    ">2x4sHHII32pII454x", f.read(0x200)
-)
-assert magic == b"CMWL"
-
-# Skip boot blocks
-f.read(0x400)
-
-size -= 0x600
-
-while size:
-    (
-        magic,
-        _,
-        _,
-        _,
-        filename,
-        part_n,
-        folder_flags,
-        valid,
-        tcode,
-        ccode,
-        flags,
-        created,
-        modified,
-        data_length,
-        resource_length,
-        data_length_this_disk,
-        resource_length_this_disk,
-        path_length,
-    ) = struct.unpack(">2x4sHII32pHBB4s4sH24xIIIIIIH", f.read(0x70))
-    assert magic == b"RLDW"
-    is_folder = folder_flags & (1 << 7) != 0
-    full_path = f.read(path_length)
-    data_fork = f.read(data_length_this_disk)
-    resource_fork = f.read(resource_length_this_disk)
-    total_size = 0x70 + path_length + data_length_this_disk + resource_length_this_disk
-    padding = 0x200 - (total_size % 0x200) if (total_size % 0x200) else 0
-    f.read(padding)
-    size -= total_size + padding
+class Record(NamedTuple):
+    """One RLDW record: a folder, or one disk's part of a file."""
+
+    disk: int
+    offset: int  # of the data fork on this disk; the resource fork follows
+    full_path: bytes
+    is_folder: bool
+    filename: bytes
+    part_n: int
+    tcode: bytes
+    ccode: bytes
+    flags: int
+    created: int
+    modified: int
+    data_length: int
+    resource_length: int
+    data_length_this_disk: int
+    resource_length_this_disk: int
+
+
+def read_disk_header(f) -> tuple[int, int, int]:
+    """Returns (disk number, number of disks, backup size) of a disk image."""
+    magic, disk_n, n_disks, _, _, volume_name, _, size = struct.unpack(
+        DISK_HEADER, f.read(0x200)
+    )
+    assert magic == b"CMWL"
+    return disk_n, n_disks, size
+
+
+def iter_records(f, disk_n: int, size: int):
+    """
+    Walks a disk's RLDW records, reading only their headers and paths.
+
+    Fork data is skipped by offset, so this costs one small read per record.
+    """
+    # Skip header and boot blocks
+    pos = 0x600
+    size -= 0x600
+
+    while size > 0:
+        f.seek(pos)
+        header = f.read(0x70)
+        if len(header) < 0x70:
+            break
+        (
+            magic,
+            _,
+            _,
+            _,
+            filename,
+            part_n,
+            folder_flags,
+            valid,
+            tcode,
+            ccode,
+            flags,
+            created,
+            modified,
+            data_length,
+            resource_length,
+            data_length_this_disk,
+            resource_length_this_disk,
+            path_length,
+        ) = struct.unpack(RECORD_HEADER, header)
+        assert magic == b"RLDW"
+        full_path = f.read(path_length)
+        yield Record(
+            disk_n,
+            pos + 0x70 + path_length,
+            full_path,
+            folder_flags & (1 << 7) != 0,
+            filename,
+            part_n,
+            tcode,
+            ccode,
+            flags,
+            created,
+            modified,
+            data_length,
+            resource_length,
+            data_length_this_disk,
+            resource_length_this_disk,
+        )
+        total_size = (
+            0x70 + path_length + data_length_this_disk + resource_length_this_disk
+        )
+        padding = 0x200 - (total_size % 0x200) if (total_size % 0x200) else 0
+        pos += total_size + padding
+        size -= total_size + padding
+
 
+def output_path(full_path: bytes) -> Path:
     out_path = Path()
     nix_path = Path(*full_path.decode("macroman").split(":"))
     for el in nix_path.parts:
@@ -126,51 +182,286 @@ while size:
             el = punyencode(el)
 
         out_path /= el
+    return out_path
+
+
+def open_disks(disk_paths: list[str]) -> dict:
+    """Opens a disk set, keyed and checked by disk number."""
+    disks = {}
+    n_disks = 0
+    for disk_path in disk_paths:
+        f = open(disk_path, "rb")
+        disk_n, n_disks, size = read_disk_header(f)
+        if disk_n in disks:
+            raise ValueError(f"{disk_path}: disk {disk_n} given twice")
+        disks[disk_n] = (f, size)
+    missing = sorted(set(range(1, n_disks + 1)) - set(disks))
+    if missing:
+        print(f"warning: missing disk(s) {', '.join(map(str, missing))} of {n_disks}")
+    return dict(sorted(disks.items()))
+
+
+def build_index(disks: dict) -> list[Record]:
+    """Runs the index pass over an opened disk set, in disk order."""
+    return [
+        record
+        for disk_n, (f, size) in disks.items()
+        for record in iter_records(f, disk_n, size)
+    ]
+
+
+def mac_path(record: Record) -> str:
+    return record.full_path.decode("macroman")
+
+
+def select(records: list[Record], only: str | None) -> list[Record]:
+    """Keeps the records whose Mac path matches the glob only, or lies under it."""
+    if not only:
+        return records
+    folder = only.rstrip(":") + ":"
+    return [
+        record
+        for record in records
+        if fnmatch.fnmatchcase(mac_path(record), only)
+        or mac_path(record).startswith(folder)
+    ]
+
+
+def list_records(records: list[Record]) -> None:
+    for record in records:
+        kind = "folder" if record.is_folder else record.tcode.decode("macroman")
+        print(
+            f"{record.disk}\t0x{record.offset:x}\t{record.part_n}\t{kind}"
+            f"\t{record.data_length_this_disk}/{record.data_length}"
+            f"\t{record.resource_length_this_disk}/{record.resource_length}"
+            f"\t{mac_path(record)}"
+        )
+
+
+def write_catalog(disk_paths: list[str], catalog_path: str) -> None:
+    """
+    Writes the index of a disk set as JSON
+
+    Records are stored as rows in Record field order, with byte strings
+    decoded as MacRoman, along with the path of each disk.
+    """
+    disks = open_disks(disk_paths)
+    try:
+        records = build_index(disks)
+    finally:
+        for f, _ in disks.values():
+            f.close()
+    catalog = {
+        "disks": {disk_n: f.name for disk_n, (f, _) in disks.items()},
+        "fields": Record._fields,
+        "records": [
+            [v.decode("macroman") if isinstance(v, bytes) else v for v in record]
+            for record in records
+        ],
+    }
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    print(f"{len(records)} records on {len(disks)} disk(s)")
+
+
+def read_catalog(catalog_path: str) -> tuple[dict[int, str], list[Record]]:
+    """Returns (disk paths by number, records) from a catalog."""
+    with open(catalog_path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    records = [
+        Record(*(v.encode("macroman") if isinstance(v, str) else v for v in row))
+        for row in catalog["records"]
+    ]
+    return {int(k): v for k, v in catalog["disks"].items()}, records
+
+
+def restore(disk_paths: list[str], only: str | None = None) -> bool:
+    """Indexes a disk set, then restores the records selected by only."""
+    disks = open_disks(disk_paths)
+    try:
+        records = select(build_index(disks), only)
+        return restore_records({n: f for n, (f, _) in disks.items()}, records)
+    finally:
+        for f, _ in disks.values():
+            f.close()
+
+
+def restore_indexed(catalog_path: str, only: str | None = None) -> bool:
+    """
+    Restores the records selected by only using a catalog.
+
+    Only the disks holding those records are opened, and each part is read
+    at its recorded offset without walking the records before it.
+    """
+    disk_paths, records = read_catalog(catalog_path)
+    records = select(records, only)
+    files = {}
+    try:
+        for disk_n in sorted({record.disk for record in records}):
+            files[disk_n] = open(disk_paths[disk_n], "rb")
+        return restore_records(files, records)
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def restore_records(files: dict, records: list[Record]) -> bool:
+    """
+    Restores records into MacBinary files under the current directory.
+
+    Each output is created at its final size up front. Every part's forks
+    are then copied straight from its disk (open in files, by disk number)
+    to their final offsets, so parts spread over several disks need no
+    appending and memory use doesn't depend on fork size. Returns False if
+    any file came out incomplete.
+    """
+    progress = {}
+    complete = True
+    for record in records:
+        try:
+            restore_record(files[record.disk], record, progress)
+        except EOFError as e:
+            # The file stays short and is reported as incomplete below.
+            complete = False
+            print(f"error: disk {record.disk}, part {record.part_n}: {e}")
+
+    for out_path, state in progress.items():
+        if state["data_done"] != state["data_length"] or (
+            state["rsrc_done"] != state["resource_length"]
+        ):
+            complete = False
+            print(
+                f"incomplete: {out_path}: parts {state['parts']}, "
+                f"df {state['data_done']}/{state['data_length']} "
+                f"rf {state['rsrc_done']}/{state['resource_length']}"
+            )
+        modified = state["modified"] - 2082844800
+        os.utime(out_path, (modified, modified))
+    return complete
 
-    os.makedirs(out_path if is_folder else out_path.parent, exist_ok=True)
+
+def restore_record(f, record: Record, progress: dict) -> None:
+    """Writes one record's forks into place, tracking per-file progress."""
+    out_path = output_path(record.full_path)
+    os.makedirs(out_path if record.is_folder else out_path.parent, exist_ok=True)
 
     print(
         "writing to {} {}, part {}, df={} rf={}".format(
-            " folder" if is_folder else "",
+            " folder" if record.is_folder else "",
             out_path,
-            part_n,
-            len(data_fork),
-            len(resource_fork),
+            record.part_n,
+            record.data_length_this_disk,
+            record.resource_length_this_disk,
         )
     )
 
-    if not is_folder:
-        if part_n > 1:
-            with open(out_path, "ab") as of:
-                if data_fork:
-                    of.write(data_fork)
-                    of.write(b"\x00" * (-data_length % 128))
-                if resource_fork:
-                    of.write(resource_fork)
-                    of.write(b"\x00" * (-resource_length % 128))
+    if record.is_folder:
+        progress[out_path] = {
+            "parts": [record.part_n],
+            "data_length": 0,
+            "resource_length": 0,
+            "data_done": 0,
+            "rsrc_done": 0,
+            "modified": record.modified,
+        }
+        return
 
-        else:
-            with open(out_path, "wb") as of:
-                of.write(
-                    file_to_macbin(
-                        data_length,
-                        resource_length,
-                        created,
-                        modified,
-                        tcode,
-                        ccode,
-                        flags,
-                        filename,
-                    )
+    state = progress.get(out_path)
+    if record.part_n == 1 or state is None:
+        data_padded = record.data_length + (-record.data_length % 128)
+        rsrc_padded = record.resource_length + (-record.resource_length % 128)
+        with open(out_path, "wb") as of:
+            of.write(
+                file_to_macbin(
+                    record.data_length,
+                    record.resource_length,
+                    record.created,
+                    record.modified,
+                    record.tcode,
+                    record.ccode,
+                    record.flags,
+                    record.filename,
                 )
-                if data_fork:
-                    of.write(data_fork)
-                    if data_length == data_length_this_disk:
-                        of.write(b"\x00" * (-data_length % 128))
-                if resource_fork:
-                    of.write(resource_fork)
-                    if resource_length == resource_length_this_disk:
-                        of.write(b"\x00" * (-resource_length % 128))
-
-    modified -= 2082844800
-    os.utime(out_path, (modified, modified))
+            )
+            of.truncate(128 + data_padded + rsrc_padded)
+        state = progress[out_path] = {
+            "parts": [],
+            "data_length": record.data_length,
+            "resource_length": record.resource_length,
+            "data_done": 0,
+            "rsrc_done": 0,
+            "modified": record.modified,
+        }
+    elif record.part_n != state["parts"][-1] + 1:
+        print(f"warning: {out_path}: part {record.part_n} after {state['parts'][-1]}")
+    state["parts"].append(record.part_n)
+
+    data_padded = state["data_length"] + (-state["data_length"] % 128)
+    with open(out_path, "r+b", buffering=0) as of:
+        if record.data_length_this_disk:
+            of.seek(128 + state["data_done"])
+            state["data_done"] += copy_exact(
+                f.fileno(), of.fileno(), record.offset, record.data_length_this_disk
+            )
+        if record.resource_length_this_disk:
+            of.seek(128 + data_padded + state["rsrc_done"])
+            state["rsrc_done"] += copy_exact(
+                f.fileno(),
+                of.fileno(),
+                record.offset + record.data_length_this_disk,
+                record.resource_length_this_disk,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Restore an Apple Backup disk set to MacBinary files"
+    )
+    parser.add_argument("disks", nargs="*", help="Disk images, in any order")
+    parser.add_argument(
+        "--catalog", metavar="JSON", help="Write an index of the disk set to JSON"
+    )
+    parser.add_argument(
+        "--index",
+        metavar="JSON",
+        help="Work from an index written by --catalog instead of walking the disks",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List records instead of restoring"
+    )
+    parser.add_argument(
+        "--only",
+        metavar="GLOB",
+        help="Only handle records whose Mac path (Vol:Folder:File) matches GLOB "
+        "or lies under it",
+    )
+    args = parser.parse_args()
+
+    if args.catalog:
+        write_catalog(args.disks, args.catalog)
+        return
+
+    if args.index:
+        if args.list:
+            list_records(select(read_catalog(args.index)[1], args.only))
+            return
+        complete = restore_indexed(args.index, args.only)
+    elif not args.disks:
+        parser.error("expected disk images, or --index")
+    elif args.list:
+        disks = open_disks(args.disks)
+        try:
+            list_records(select(build_index(disks), args.only))
+        finally:
+            for f, _ in disks.values():
+                f.close()
+        return
+    else:
+        complete = restore(args.disks, args.only)
+
+    if not complete:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ import struct
 from hashlib import md5
 from pathlib import Path
 
-SPECIAL_SYMBOLS = frozenset('/":*|\\?%<>\x7f')
+from puny import punyencode
+
 VERSION_MAP = [
     (0x79F, 1201),
     (0x783, 1200),
@@ -37,29 +38,37 @@ def check_pjver(ver: int | None) -> int:
     return 200
 
 
-def escape_string(s: str) -> str:
-    """Escape special characters for punycode encoding."""
-    result = []
-    for char in s:
-        if char == "\x81":
-            result.append("\x81\x79")
-        elif char in SPECIAL_SYMBOLS or ord(char) < 0x20:
-            result.append("\x81")
-            result.append(chr(0x80 + ord(char)))
-        else:
-            result.append(char)
-    return "".join(result)
-
-
-def needs_punyencoding(s: str) -> bool:
-    """Check if string needs punycode encoding."""
-    if s and s[-1] in " .":
-        return True
-    return any(ord(c) < 0x20 or ord(c) >= 0x80 or c in SPECIAL_SYMBOLS for c in s)
-
-
-def extract_version(f) -> int:
-    """Extract project version from file."""
+def find_marker(
+    f, start: int, markers, window: int | None = None, chunk_size: int = 1 << 20
+) -> int:
+    """
+    Return the absolute offset of the first of markers at or after start.
+
+    The file is scanned in chunks, overlapping by the longest marker so hits
+    straddling a chunk boundary are found, and reading stops at the first
+    hit or after window bytes. Returns -1 if nothing was found.
+    """
+    overlap = max(len(m) for m in markers) - 1
+    end = None if window is None else start + window
+    pos = start
+    tail = b""
+    while end is None or pos < end:
+        f.seek(pos)
+        size = chunk_size if end is None else min(chunk_size, end - pos)
+        chunk = f.read(size)
+        if not chunk:
+            break
+        data = tail + chunk
+        hits = [off for off in (data.find(m) for m in markers) if off >= 0]
+        if hits:
+            return pos - len(tail) + min(hits)
+        tail = data[-overlap:] if overlap else b""
+        pos += len(chunk)
+    return -1
+
+
+def extract_version(f, window: int | None = None) -> int:
+    """Extract project version from file, scanning at most window bytes."""
     try:
         # Find project and RIFX offsets
         f.seek(-4, 2)
@@ -67,23 +76,20 @@ def extract_version(f) -> int:
         f.seek(projoff + 4)
         rifxoff = struct.unpack("<I", f.read(4))[0]
 
-        # Search for version in APPLimap
-        f.seek(rifxoff)
-        data = f.read()
-
+        # Search for version in the imap chunk, little-endian tag first
         for marker in (b"LPPApami", b"APPLimap"):
-            off = data.find(marker)
-            if off > 0:
-                f.seek(rifxoff + off + 0x14)
+            off = find_marker(f, rifxoff, (marker,), window)
+            if off > rifxoff:
+                f.seek(off + 0x14)
                 pjver = struct.unpack("<I", f.read(4))[0]
                 if pjver:
                     return pjver
                 break
 
         # Fallback to VWCF
-        off = data.find(b"FCWV")
+        off = find_marker(f, rifxoff, (b"FCWV",), window)
         if off >= 0:
-            f.seek(rifxoff + off + 4)
+            f.seek(off + 4)
             _, vwcfoff = struct.unpack("<II", f.read(8))
             f.seek(vwcfoff + 0x2C)
             return struct.unpack(">H", f.read(2))[0]
@@ -116,22 +122,25 @@ def main():
     parser.add_argument("file_path", type=Path)
     parser.add_argument("--head", action="store_true")
     parser.add_argument("--version", action="store_true")
+    parser.add_argument(
+        "--window",
+        type=int,
+        help="Only search this many bytes past the RIFX offset for the version",
+    )
     args = parser.parse_args()
 
     if not args.file_path.exists():
         parser.error(f"File not found: {args.file_path}")
 
     with args.file_path.open("rb") as f:
-        pjver = extract_version(f) if args.version else None
+        pjver = extract_version(f, args.window) if args.version else None
         prefix = "h:" if args.head else "t:"
         m = compute_hash(f, args.head)
 
         f.seek(0, 2)
         size = f.tell()
 
-    fn = args.file_path.name
-    if needs_punyencoding(fn):
-        fn = "xn--" + escape_string(fn).encode("punycode").decode("ascii")
+    fn = punyencode(args.file_path.name)
 
     if args.version:
         version = check_pjver(pjver)